@@ -4,7 +4,13 @@
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple
-from physics import run_static_calculations, simulate_full_system, aggregate_sim_stats
+from physics import (
+    run_static_calculations,
+    simulate_full_system_batch,
+    traction_current,
+    batch_steady_state_tol,
+    RESULT_STORE,
+)
 
 
 SCANNABLE_PARAMS = {
@@ -53,6 +59,103 @@ SCANNABLE_PARAMS = {
 }
 
 
+# Метрики скана (колонки результата помимо значений параметров)
+SCAN_METRICS = {
+    "speed_kmh": ("Скорость", "км/ч"),
+    "total_mass": ("Масса", "кг"),
+    "weapon_energy_kj": ("Энергия удара", "кДж"),
+    "peak_current": ("Пиковый ток", "А"),
+    "traction_current": ("Ток на пределе сцепления", "А"),
+    "time_to_20": ("Разгон до 20 км/ч", "с"),
+    "temp_max": ("Температура моторов", "°C"),
+}
+SCAN_MAX_TIME = 5.0  # горизонт симуляции скана
+SCAN_POINT_DECIMALS = 9  # точность совпадения значений параметра в scan_points
+
+
+def evaluate_scan_points(base_inputs: Dict, values: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Метрики SCAN_METRICS для набора точек: values - {параметр: массив значений}
+    (массивы одной длины). Одна векторная статика и один батчевый прогон без
+    траекторий, оружие отключено.
+    """
+    # Все точки - одна векторная статика (столбцы values - массивы)
+    inputs = base_inputs.copy()
+    inputs.update(values)
+    static_res = run_static_calculations(inputs)
+    shape = np.shape(next(iter(values.values())))
+    
+    sim_params = {
+        "voltage_nom": static_res["voltage_nom"],
+        "battery_ir_mohm": inputs["battery_ir_mohm"],
+        "drive_motor_count": inputs["drive_motor_count"],
+        "motor_kv": inputs["motor_kv"],
+        "gear_ratio": inputs["gear_ratio"],
+        "wheel_dia_mm": inputs["wheel_dia_mm"],
+        "friction_coeff": inputs["friction_coeff"],
+        "esc_current_limit_drive": inputs["esc_current_limit_drive"],
+        "simulate_weapon": False,  # отключаем оружие для скорости
+        "weapon_motor_count": inputs["weapon_motor_count"],
+        "weapon_motor_kv": inputs["weapon_motor_kv"],
+        "weapon_reduction": inputs["weapon_reduction"],
+        "weapon_inertia": static_res["weapon_inertia"],
+        "esc_current_limit_weapon": inputs["esc_current_limit_weapon"],
+    }
+    
+    # ... и один батчевый прогон без траекторий
+    total_mass = np.broadcast_to(static_res["total_mass"], shape)
+    sim_stats = simulate_full_system_batch(
+        sim_params, total_mass, max_time=SCAN_MAX_TIME,
+        stats_only=True, steady_state_tol=batch_steady_state_tol()
+    )
+    
+    return {
+        "speed_kmh": np.broadcast_to(static_res["speed_kmh"], shape),
+        "total_mass": total_mass,
+        "weapon_energy_kj": np.broadcast_to(static_res["weapon_energy"] / 1000, shape),
+        "peak_current": sim_stats["peak_current"],
+        # Пиковый ток скана упирается в лимит ESC; ток сцепления - без лимита
+        "traction_current": traction_current(sim_params, total_mass),
+        "time_to_20": sim_stats["time_to_20"],  # SCAN_MAX_TIME - не достиг
+        "temp_max": sim_stats["temp_drive_max"],
+    }
+
+
+def scan_points(base_inputs: Dict, param_name: str, param_values: np.ndarray) -> pd.DataFrame:
+    """
+    Метрики скана в точках param_values с накоплением в хранилище: для пары
+    (базовая конфигурация без param_name, param_name) хранятся все когда-либо
+    посчитанные точки, считаются только новые. Значения сравниваются с
+    точностью SCAN_POINT_DECIMALS знаков.
+    Возвращает DataFrame (param_value + SCAN_METRICS) в порядке param_values.
+    """
+    param_values = np.asarray(param_values, dtype=float)
+    store_inputs = {
+        "base_inputs": {k: v for k, v in base_inputs.items() if k != param_name},
+        "param_name": param_name,
+    }
+    known = RESULT_STORE.get("scan_points", store_inputs)
+    if known is None:
+        known = pd.DataFrame(columns=["param_value", *SCAN_METRICS], dtype=float)
+    
+    keys = np.round(param_values, SCAN_POINT_DECIMALS)
+    known_keys = np.round(known["param_value"].to_numpy(dtype=float), SCAN_POINT_DECIMALS)
+    missing = np.unique(param_values[~np.isin(keys, known_keys)])
+    if len(missing):
+        metrics = evaluate_scan_points(base_inputs, {param_name: missing})
+        fresh = pd.DataFrame({"param_value": missing, **metrics})
+        known = fresh if known.empty else pd.concat([known, fresh], ignore_index=True)
+        RESULT_STORE.put("scan_points", store_inputs, known)
+        known_keys = np.round(known["param_value"].to_numpy(dtype=float), SCAN_POINT_DECIMALS)
+    
+    # Выборка в запрошенном порядке; param_value - ровно запрошенные значения
+    rows = pd.Series(np.arange(len(known)), index=known_keys)
+    rows = rows[~rows.index.duplicated()]
+    df = known.iloc[rows.loc[keys].to_numpy()].reset_index(drop=True)
+    df["param_value"] = param_values
+    return df
+
+
 def run_parameter_scan(
     base_inputs: Dict,
     param_name: str,
@@ -61,106 +164,181 @@ def run_parameter_scan(
 ) -> pd.DataFrame:
     """
     Сканирование одного параметра по диапазону.
+    Ранее посчитанные точки (другой диапазон/шаг) берутся из хранилища - см. scan_points.
     Возвращает DataFrame с результатами.
     """
     min_val, max_val = param_range
     param_values = np.linspace(min_val, max_val, num_points)
+    return scan_points(base_inputs, param_name, param_values)
+
+
+@RESULT_STORE.persistent("grid_scan")
+def run_grid_scan(
+    base_inputs: Dict,
+    param_ranges: Dict[str, Tuple[float, float]],
+    num_points: int = 30
+) -> pd.DataFrame:
+    """
+    Сканирование по сетке из нескольких параметров (любое подмножество SCANNABLE_PARAMS).
+    param_ranges - {параметр: (мин, макс)}; num_points - точек на ось (int или
+    {параметр: int}). Все узлы сетки считаются одним батчем.
+    Возвращает "длинный" DataFrame: по колонке на параметр и колонки SCAN_METRICS,
+    строка - узел сетки (порядок C: последний параметр меняется быстрее).
+    В df.attrs["axes"] - {параметр: значения оси}.
+    """
+    axes = {
+        name: np.linspace(low, high, num_points[name] if isinstance(num_points, dict) else num_points)
+        for name, (low, high) in param_ranges.items()
+    }
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    values = {name: grid.ravel() for name, grid in zip(axes, mesh)}
+    metrics = evaluate_scan_points(base_inputs, values)
     
-    results = []
+    df = pd.DataFrame({**values, **metrics})
+    df.attrs["axes"] = axes
+    return df
+
+
+# Нормированные кривые, по которым уточняется адаптивный скан (колонки get_optimal_range)
+ADAPTIVE_SCORES = ("speed_score", "energy_score", "mass_score", "current_score", "time_score", "total_score")
+
+
+@RESULT_STORE.persistent("adaptive_scan")
+def run_adaptive_scan(
+    base_inputs: Dict,
+    param_name: str,
+    param_range: Tuple[float, float],
+    max_points: int = 20,
+    initial_points: int = 7,
+    resolution: float = None,
+    change_tol: float = 0.05
+) -> pd.DataFrame:
+    """
+    Адаптивное сканирование одного параметра: грубая сетка из initial_points,
+    затем делятся пополам интервалы, где нормированные кривые (ADAPTIVE_SCORES)
+    меняются или изгибаются сильнее change_tol, и интервалы рядом с лучшей точкой.
+    Интервалы уже resolution (по умолчанию 1/200 диапазона) не делятся.
+    Останов - нечего делить или исчерпан бюджет max_points.
+    Возвращает DataFrame как run_parameter_scan (по возрастанию param_value)
+    и колонку round - раунд, в котором посчитана точка (0 - грубая сетка).
+    """
+    min_val, max_val = param_range
+    if resolution is None:
+        resolution = (max_val - min_val) / 200
     
-    for val in param_values:
-        # Создаем копию входных данных
-        inputs = base_inputs.copy()
-        inputs[param_name] = val
+    new_values = np.linspace(min_val, max_val, min(initial_points, max_points))
+    frames = []
+    for round_idx in range(max_points):
+        frames.append(scan_points(base_inputs, param_name, new_values).assign(round=round_idx))
+        df = pd.concat(frames, ignore_index=True).sort_values("param_value", ignore_index=True)
         
-        # Пересчитываем статику
-        static_res = run_static_calculations(inputs)
+        budget = max_points - len(df)
+        if budget <= 0 or len(df) < 2:
+            break
         
-        # Быстрая симуляция (меньше точек для скорости)
-        sim_params = {
-            "voltage_nom": static_res["voltage_nom"],
-            "battery_ir_mohm": inputs["battery_ir_mohm"],
-            "drive_motor_count": inputs["drive_motor_count"],
-            "motor_kv": inputs["motor_kv"],
-            "gear_ratio": inputs["gear_ratio"],
-            "wheel_dia_mm": inputs["wheel_dia_mm"],
-            "friction_coeff": inputs["friction_coeff"],
-            "esc_current_limit_drive": inputs["esc_current_limit_drive"],
-            "simulate_weapon": False,  # отключаем оружие для скорости
-            "weapon_motor_count": inputs["weapon_motor_count"],
-            "weapon_motor_kv": inputs["weapon_motor_kv"],
-            "weapon_reduction": inputs["weapon_reduction"],
-            "weapon_inertia": static_res["weapon_inertia"],
-            "esc_current_limit_weapon": inputs["esc_current_limit_weapon"],
-        }
+        result = get_optimal_range(df, param_name)
+        x = df["param_value"].to_numpy(dtype=float)
+        scores = result["scores"][list(ADAPTIVE_SCORES)].fillna(0).to_numpy().T
+        total = scores[-1]
+        scores[-1] = (total - total.min()) / (np.ptp(total) or 1.0)
         
-        df_sim = simulate_full_system(sim_params, static_res["total_mass"], max_time=5.0)
-        sim_stats = aggregate_sim_stats(df_sim)
+        # Потеря интервала: перепад кривой на нем и отклонение концов от хорды соседей
+        jump = np.abs(np.diff(scores, axis=1)).max(axis=0)
+        bend = np.zeros(len(x))
+        if len(x) > 2:
+            w = (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+            chord = scores[:, :-2] + w * (scores[:, 2:] - scores[:, :-2])
+            bend[1:-1] = np.abs(scores[:, 1:-1] - chord).max(axis=0)
+        loss = np.maximum(jump, np.maximum(bend[:-1], bend[1:]))
         
-        # Время разгона
-        try:
-            # Ищем первое вхождение скорости >= 20
-            reached = df_sim[df_sim["v_kmh"] >= 20.0]
-            if not reached.empty:
-                time_to_20 = reached.iloc[0]["t"]
-            else:
-                time_to_20 = 5.0 # Макс время симуляции
-        except Exception:
-            time_to_20 = 5.0
+        # Интервалы рядом с оптимумом делятся всегда - уточняем рекомендацию
+        best = int(result["best_idx"])
+        loss[max(best - 1, 0):best + 1] = np.inf
         
-        results.append({
-            "param_value": val,
-            "speed_kmh": static_res["speed_kmh"],
-            "total_mass": static_res["total_mass"],
-            "weapon_energy_kj": static_res["weapon_energy"] / 1000,
-            "peak_current": sim_stats["peak_current"],
-            "time_to_20": time_to_20,
-            "temp_max": sim_stats["temp_drive_max"]
-        })
+        candidates = np.flatnonzero((np.diff(x) > resolution) & (loss > change_tol))
+        if len(candidates) == 0:
+            break
+        # За раунд - не больше четверти остатка бюджета: следующие раунды видят новый оптимум
+        chosen = candidates[np.argsort(-loss[candidates], kind="stable")[:min(budget, max(2, budget // 4))]]
+        new_values = (x[chosen] + x[chosen + 1]) / 2
+    
+    return df
+
+
+# Критерии общего балла: метрика -> (колонка балла, максимизировать, вес по умолчанию)
+SCORE_CRITERIA = {
+    "speed_kmh": ("speed_score", True, 0.3),
+    "weapon_energy_kj": ("energy_score", True, 0.2),
+    "total_mass": ("mass_score", False, 0.2),
+    "peak_current": ("current_score", False, 0.15),
+    "time_to_20": ("time_score", False, 0.15),
+}
+DEFAULT_SCORE_WEIGHTS = {metric: weight for metric, (_, _, weight) in SCORE_CRITERIA.items()}
+
+
+def pareto_front(df: pd.DataFrame, objectives: Dict[str, bool] = None) -> np.ndarray:
+    """
+    Маска недоминируемых точек скана (любой размерности). objectives -
+    {колонка: максимизировать} (по умолчанию критерии SCORE_CRITERIA).
+    Точка доминируема, если другая не хуже по всем целям и лучше хотя бы по одной;
+    совпадающие точки друг друга не доминируют.
+    Последовательное отсеивание: очередной кандидат векторно убирает всех,
+    кого доминирует; кандидаты - по возрастанию суммы целей, так что сильные
+    точки идут первыми и множество быстро сужается.
+    """
+    if objectives is None:
+        objectives = {metric: maximize for metric, (_, maximize, _) in SCORE_CRITERIA.items()}
+    # Все цели - к минимизации
+    costs = np.column_stack([
+        -df[col].to_numpy(dtype=float) if maximize else df[col].to_numpy(dtype=float)
+        for col, maximize in objectives.items()
+    ]) if len(df) else np.empty((0, len(objectives)))
     
-    return pd.DataFrame(results)
+    order = np.argsort(costs.sum(axis=1), kind="stable")
+    candidates, costs = order, costs[order]
+    i = 0
+    while i < len(costs):
+        keep = np.any(costs < costs[i], axis=1) | np.all(costs == costs[i], axis=1)
+        candidates, costs = candidates[keep], costs[keep]
+        i = np.count_nonzero(keep[:i]) + 1
+    
+    mask = np.zeros(len(df), dtype=bool)
+    mask[candidates] = True
+    return mask
 
 
-def get_optimal_range(df: pd.DataFrame, param_name: str) -> Dict:
+def get_optimal_range(df: pd.DataFrame, param_name: str, weights: Dict[str, float] = None) -> Dict:
     """
-    Анализ оптимального диапазона на основе результатов сканирования.
+    Анализ оптимального диапазона на основе результатов сканирования
+    (run_parameter_scan, run_adaptive_scan или run_grid_scan).
+    weights - веса критериев {метрика: вес} (по умолчанию DEFAULT_SCORE_WEIGHTS);
+    пересчет с другими весами не требует симуляций.
+    В scores - нормированные баллы, total_score и pareto (маска pareto_front).
+    Для сеточного скана optimal_value - dict {параметр: значение}.
     """
     if df.empty:
         return {"optimal_value": 0, "best_idx": 0, "scores": df}
+    weights = {**DEFAULT_SCORE_WEIGHTS, **(weights or {})}
 
     df_norm = df.copy()
     
-    # Вспомогательная функция для безопасной нормализации (0..1)
-    def normalize(series, maximize=True):
-        min_val = series.min()
-        max_val = series.max()
-        diff = max_val - min_val
-        
-        # Защита от деления на ноль (если все значения одинаковые)
-        if diff == 0:
-            return pd.Series([0.5] * len(series), index=series.index)
-            
-        if maximize:
-            return (series - min_val) / diff
-        else:
-            return 1.0 - (series - min_val) / diff
-
-    # Нормализуем метрики
-    df_norm["speed_score"] = normalize(df["speed_kmh"], maximize=True)
-    df_norm["energy_score"] = normalize(df["weapon_energy_kj"], maximize=True)
-    df_norm["mass_score"] = normalize(df["total_mass"], maximize=False)
-    df_norm["current_score"] = normalize(df["peak_current"], maximize=False)
-    df_norm["time_score"] = normalize(df["time_to_20"], maximize=False)
-    
-    # Считаем общий балл с весами
-    # fillna(0) защищает от NaN если что-то пошло не так
-    df_norm["total_score"] = (
-        df_norm["speed_score"].fillna(0) * 0.3 +
-        df_norm["energy_score"].fillna(0) * 0.2 +
-        df_norm["mass_score"].fillna(0) * 0.2 +
-        df_norm["current_score"].fillna(0) * 0.15 +
-        df_norm["time_score"].fillna(0) * 0.15
-    )
+    # Нормализация 0..1 всех критериев разом; постоянная метрика дает 0.5
+    metrics = df[list(SCORE_CRITERIA)].to_numpy(dtype=float)
+    low, high = np.nanmin(metrics, axis=0), np.nanmax(metrics, axis=0)
+    diff = high - low
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm = (metrics - low) / diff
+    maximize = np.array([m for _, m, _ in SCORE_CRITERIA.values()])
+    norm = np.where(maximize, norm, 1.0 - norm)
+    norm = np.where(diff == 0, 0.5, norm)
+    
+    # Общий балл с весами; nan (если что-то пошло не так) считается нулем
+    total = np.zeros(len(df))
+    for j, (metric, (score_col, _, _)) in enumerate(SCORE_CRITERIA.items()):
+        df_norm[score_col] = norm[:, j]
+        total = total + np.nan_to_num(norm[:, j]) * weights[metric]
+    df_norm["total_score"] = total
+    df_norm["pareto"] = pareto_front(df)
     
     # Находим индекс лучшего значения
     best_idx = df_norm["total_score"].idxmax()
@@ -168,8 +346,11 @@ def get_optimal_range(df: pd.DataFrame, param_name: str) -> Dict:
     # Защита: если idxmax вернул NaN (крайне редко)
     if pd.isna(best_idx):
         best_idx = df.index[0]
-        
-    optimal_value = df.loc[best_idx, "param_value"]
+    
+    if "param_value" in df:
+        optimal_value = df.loc[best_idx, "param_value"]
+    else:
+        optimal_value = {name: df.loc[best_idx, name] for name in df.attrs.get("axes", {param_name: None})}
     
     return {
         "optimal_value": optimal_value,
@@ -0,0 +1,271 @@
+"""
+Бенчмарки расчетного ядра (запуск: python benchmarks.py).
+Не зависят от Streamlit: конфигурация 1T Rex повторяет значения сайдбара по умолчанию.
+"""
+import time
+import numpy as np
+from typing import Callable, Dict
+from physics import (
+    run_static_calculations,
+    simulate_full_system,
+    simulate_full_system_batch,
+    set_backend,
+    get_backend,
+    run_monte_carlo_simulation,
+    STEADY_STATE_TOL,
+    _simulate_euler_jit,
+)
+from physics_jit import NUMBA_AVAILABLE
+from optimizer import OptimizationObjective, run_differential_evolution, get_default_bounds
+
+# Конфигурация 1T Rex по умолчанию (как в main.build_sidebar)
+DEFAULT_INPUTS = {
+    "name": "1T Rex",
+    "voltage_s": 12,
+    "battery_ir_mohm": 25.0,
+    "drive_motor_count": 4,
+    "motor_kv": 190,
+    "gear_ratio": 12.5,
+    "wheel_dia_mm": 200,
+    "esc_current_limit_drive": 60,
+    "friction_coeff": 0.7,
+    "simulate_weapon": True,
+    "weapon_motor_count": 2,
+    "weapon_motor_kv": 150,
+    "weapon_reduction": 1.5,
+    "weapon_mass_kg": 28.0,
+    "weapon_radius_mm": 180,
+    "esc_current_limit_weapon": 120,
+    "armor_thickness": 5,
+    "armor_coverage": 35,
+    "base_drive_mass": 18.0,
+    "base_elec_mass": 12.0,
+    "base_frame_mass": 25.0,
+    "armor_density_kg_m3": 2700.0,
+    "armor_area_total": 3.0,
+}
+
+
+def default_sim_params(inputs: Dict = DEFAULT_INPUTS):
+    """Статика и параметры симуляции для конфигурации (как в main.main)."""
+    static_res = run_static_calculations(inputs)
+    sim_params = {
+        "voltage_nom": static_res["voltage_nom"],
+        "battery_ir_mohm": inputs["battery_ir_mohm"],
+        "drive_motor_count": inputs["drive_motor_count"],
+        "motor_kv": inputs["motor_kv"],
+        "gear_ratio": inputs["gear_ratio"],
+        "wheel_dia_mm": inputs["wheel_dia_mm"],
+        "friction_coeff": inputs["friction_coeff"],
+        "esc_current_limit_drive": inputs["esc_current_limit_drive"],
+        "simulate_weapon": inputs["simulate_weapon"],
+        "weapon_motor_count": inputs["weapon_motor_count"],
+        "weapon_motor_kv": inputs["weapon_motor_kv"],
+        "weapon_reduction": inputs["weapon_reduction"],
+        "weapon_inertia": static_res["weapon_inertia"],
+        "esc_current_limit_weapon": inputs["esc_current_limit_weapon"],
+    }
+    return static_res, sim_params
+
+
+def best_time(func: Callable, repeats: int = 5) -> float:
+    """Лучшее время из нескольких запусков, с."""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_integrators(max_time: float = 8.0, batch_size: int = 500):
+    """
+    Сравнение интеграторов на конфигурации 1T Rex: число шагов, время
+    (одна конфигурация и батч) и ошибка против эталона (RK4, шаг 0.5 мс).
+    """
+    static_res, sim_params = default_sim_params()
+    mass = static_res["total_mass"]
+    reference = simulate_full_system(sim_params, mass, max_time, integrator="rk4", dt=0.0005)
+
+    rng = np.random.default_rng(0)
+    batch_params = dict(sim_params)
+    batch_params["motor_kv"] = sim_params["motor_kv"] * (1.0 + 0.03 * rng.standard_normal(batch_size))
+
+    cases = [
+        ("euler", {}, 0.05),
+        ("rk4", {"dt": 0.1}, 0.0),
+        ("rk4", {"dt": 0.2}, 0.0),
+        ("rk23", {"rtol": 1e-3}, 0.0),
+        ("rk23", {}, 0.0),
+        ("analytic", {}, 0.0),
+    ]
+    print(f"{'метод':<16}{'шагов':>7}{'1 конф., мс':>13}{'батч, мс':>11}{'ошибка v, км/ч':>17}{'ошибка T, °C':>15}")
+    for integrator, options, t_shift in cases:
+        result = simulate_full_system(sim_params, mass, max_time, integrator=integrator, **options)
+        # В схеме Эйлера строка t хранит состояние после шага (t + dt)
+        t_state = result["t"] + t_shift
+        err_v = np.max(np.abs(np.interp(t_state, reference["t"], reference["v_kmh"]) - result["v_kmh"]))
+        err_temp = np.max(np.abs(np.interp(t_state, reference["t"], reference["T_drive"]) - result["T_drive"]))
+
+        single = best_time(lambda: simulate_full_system(
+            sim_params, mass, max_time, integrator=integrator, **options
+        ))
+        batch = best_time(lambda: simulate_full_system_batch(
+            batch_params, mass, max_time, integrator=integrator, **options
+        ), repeats=3)
+
+        label = integrator + "".join(f" {key}={val}" for key, val in options.items())
+        # Для analytic это точки сетки вывода, а не шаги интегрирования
+        steps = len(result) - (0 if integrator == "euler" else 1)
+        print(f"{label:<16}{steps:>7}{single * 1e3:>13.2f}{batch * 1e3:>11.1f}{err_v:>17.4f}{err_temp:>15.5f}")
+
+
+def benchmark_static_screening(n: int = 100_000, mass_limit_kg: float = 110.0):
+    """
+    Векторная статика: n случайных геометрий одним вызовом run_static_calculations
+    и отбор по лимиту массы (ROBOT_LIMIT_KG в main).
+    """
+    rng = np.random.default_rng(0)
+    batch = dict(DEFAULT_INPUTS)
+    batch.update(
+        gear_ratio=rng.uniform(8.0, 20.0, n),
+        wheel_dia_mm=rng.uniform(150, 300, n),
+        armor_thickness=rng.uniform(2, 12, n),
+        armor_coverage=rng.uniform(20, 60, n),
+        weapon_mass_kg=rng.uniform(15.0, 40.0, n),
+        weapon_radius_mm=rng.uniform(120, 250, n),
+    )
+    fits = None
+
+    def screen():
+        nonlocal fits
+        fits = run_static_calculations(batch)["total_mass"] <= mass_limit_kg
+
+    elapsed = best_time(screen)
+    print(f"статика {n} конфигураций: {elapsed * 1e3:.1f} мс, в лимите {mass_limit_kg:g} кг: {np.count_nonzero(fits)}")
+
+
+def benchmark_backends(max_time: float = 8.0, batch_size: int = 500):
+    """
+    Схема Эйлера на бэкендах python и numba: одна конфигурация и батч, мс,
+    и ускорение numba. Одна конфигурация упирается в накладные расходы вызова,
+    батч метрик - в последовательную цепочку делений шага (Python-батч уже
+    векторизован numpy); батч от JIT_PARALLEL_MIN_ROWS строк делится между
+    потоками numba, так что его ускорение растет с числом ядер.
+    """
+    if not NUMBA_AVAILABLE:
+        print("numba не установлена - сравнивать не с чем")
+        return
+    static_res, sim_params = default_sim_params()
+    mass = static_res["total_mass"]
+    rng = np.random.default_rng(0)
+    batch_params = dict(sim_params)
+    batch_params["motor_kv"] = sim_params["motor_kv"] * (1.0 + 0.03 * rng.standard_normal(batch_size))
+
+    previous = get_backend()
+    widths = (12, 10, 10, 14)
+    timings = {}
+    print(f"{'бэкенд':<10}{'траектория':>12}{'метрики':>10}{'батч':>10}{'батч метрики':>14}")
+    for backend in ("python", "numba"):
+        set_backend(backend)
+        simulate_full_system(sim_params, mass, max_time)  # компиляция ядра
+        timings[backend] = (
+            best_time(lambda: simulate_full_system(sim_params, mass, max_time), repeats=50),
+            best_time(lambda: simulate_full_system(sim_params, mass, max_time, stats_only=True), repeats=50),
+            best_time(lambda: simulate_full_system_batch(batch_params, mass, max_time), repeats=10),
+            best_time(lambda: simulate_full_system_batch(batch_params, mass, max_time, stats_only=True), repeats=10),
+        )
+        print(f"{backend:<10}" + "".join(f"{val * 1e3:>{w}.2f}" for val, w in zip(timings[backend], widths)))
+    speedup = [slow / fast for slow, fast in zip(timings["python"], timings["numba"])]
+    print(f"{'ускорение':<10}" + "".join(f"{val:>{w - 1}.1f}x" for val, w in zip(speedup, widths)))
+    set_backend(previous)
+
+
+def benchmark_steady_state(batch_size: int = 128, horizons=(4.0, 8.0, 20.0)):
+    """
+    Досчет установившегося режима (steady_state_tol) на чанке Монте-Карло:
+    шаги строк, которые ядро numba действительно прошло, и время stats_only-батча
+    с допуском и без на обоих бэкендах, мс. Python-путь выигрывает только на длинном
+    горизонте, поэтому batch_steady_state_tol включает допуск лишь на numba.
+    """
+    static_res, sim_params = default_sim_params()
+    mass = static_res["total_mass"]
+    rng = np.random.default_rng(0)
+    batch_params = dict(sim_params)
+    for key in ("motor_kv", "friction_coeff", "battery_ir_mohm"):
+        batch_params[key] = sim_params[key] * (1.0 + 0.05 * rng.standard_normal(batch_size))
+
+    previous = get_backend()
+    backends = ("python", "numba") if NUMBA_AVAILABLE else ("python",)
+    print(f"{'горизонт, с':<13}{'шагов numba':>13}{'с допуском':>12}" + "".join(
+        f"{backend + ', мс':>14}{'с допуском':>12}" for backend in backends
+    ))
+    for max_time in horizons:
+        steps_full = batch_size * len(np.arange(0, max_time, 0.05))
+        steps_tol = steps_full
+        if NUMBA_AVAILABLE:
+            settle_step = np.empty(batch_size, dtype=np.int64)
+            _simulate_euler_jit(batch_params, mass, max_time, True, STEADY_STATE_TOL, settle_step=settle_step)
+            steps_tol = int(np.where(settle_step >= 0, settle_step + 1, steps_full // batch_size).sum())
+        line = f"{max_time:<13g}{steps_full:>13}{steps_tol:>12}"
+        for backend in backends:
+            set_backend(backend)
+            timings = [
+                best_time(lambda: simulate_full_system_batch(
+                    batch_params, mass, max_time, stats_only=True, steady_state_tol=tol
+                ), repeats=20)
+                for tol in (None, STEADY_STATE_TOL)
+            ]
+            line += f"{timings[0] * 1e3:>14.2f}{timings[1] * 1e3:>12.2f}"
+        print(line)
+    set_backend(previous)
+
+
+def benchmark_monte_carlo(iterations: int = 20_000, worker_counts=(1, 2, 4, 8, 16)):
+    """Монте-Карло на пуле процессов: время и ускорение по числу процессов (без хранилища)."""
+    static_res, _ = default_sim_params()
+    monte_carlo = run_monte_carlo_simulation.__wrapped__
+    reference = monte_carlo(DEFAULT_INPUTS, static_res, iterations=iterations)
+    base = None
+    print(f"{'процессов':<11}{'время, мс':>11}{'ускорение':>11}")
+    for workers in worker_counts:
+        result = None
+
+        def run():
+            nonlocal result
+            result = monte_carlo(DEFAULT_INPUTS, static_res, iterations=iterations, workers=workers)
+
+        elapsed = best_time(run, repeats=3)
+        base = base or elapsed
+        assert result.equals(reference), "результат зависит от числа процессов"
+        print(f"{workers:<11}{elapsed * 1e3:>11.1f}{base / elapsed:>11.2f}")
+
+
+def benchmark_optimizer(max_iterations: int = 50, worker_counts=(1, 2, 4, 8, 16)):
+    """Дифференциальная эволюция на пуле процессов: время и ускорение (без хранилища)."""
+    goals = {"maximize_speed": True, "maximize_energy": True, "minimize_mass": True, "minimize_current": True}
+    objective = OptimizationObjective(DEFAULT_INPUTS, goals, {"max_mass": 110.0, "max_current": 400.0})
+    reference, base = None, None
+    print(f"{'процессов':<11}{'время, мс':>11}{'ускорение':>11}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        result, _ = run_differential_evolution(objective, get_default_bounds(), max_iterations, workers)
+        elapsed = time.perf_counter() - start
+        reference = reference if reference is not None else result.x
+        base = base or elapsed
+        assert np.array_equal(result.x, reference), "результат зависит от числа процессов"
+        print(f"{workers:<11}{elapsed * 1e3:>11.1f}{base / elapsed:>11.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_integrators()
+    print()
+    benchmark_backends()
+    print()
+    benchmark_steady_state()
+    print()
+    benchmark_static_screening()
+    print()
+    benchmark_monte_carlo()
+    print()
+    benchmark_optimizer()
@@ -1,8 +1,11 @@
 """
 Модуль сравнения конфигураций (Side-by-Side).
 """
+import numpy as np
+import pandas as pd
 import streamlit as st
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Union
+from physics import run_static_calculations, collision_matrix
 
 
 def init_comparison_state():
@@ -74,3 +77,76 @@ def get_comparison_data(config_a: Dict, config_b: Dict) -> Dict:
         }
     
     return comparison
+
+
+def _tournament_inputs(designs: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Участники турнира -> DataFrame входов (строка на конструкцию, колонка name).
+    designs - сохраненные конфигурации (dict с "name" и "inputs") либо
+    библиотека конструкций в виде DataFrame входов.
+    """
+    if isinstance(designs, pd.DataFrame):
+        frame = designs.reset_index(drop=True)
+    else:
+        frame = pd.DataFrame([{**d["inputs"], "name": d["name"]} for d in designs])
+    if "name" not in frame.columns:
+        frame["name"] = [f"#{i + 1}" for i in range(len(frame))]
+    return frame
+
+
+def run_tournament(designs: Union[List[Dict], pd.DataFrame]) -> Dict:
+    """
+    Турнир "каждый с каждым": удар i по j для всех пар одним матричным расчетом.
+    Возвращает имена, массы, энергию ротора (N,) и матрицы (N, N), где строка -
+    атакующий, столбец - цель: g_dealt (перегрузка цели), g_recoil (своя
+    перегрузка атакующего), recoil_kmh (отскок атакующего). Ответный удар j по i -
+    транспонированная матрица.
+    """
+    frame = _tournament_inputs(designs)
+    static = run_static_calculations(frame)
+    n = len(frame)
+    mass = np.broadcast_to(static["total_mass"], (n,))
+    grid = collision_matrix(mass, static["weapon_inertia"], static["weapon_rpm"], mass)
+    return {
+        "names": frame["name"].to_numpy(),
+        "mass": mass,
+        "energy_kj": grid["energy_joules"] / 1000,
+        "g_dealt": grid["g_force_target"],
+        "g_recoil": grid["g_force_self"],
+        "recoil_kmh": grid["recoil_speed_kmh"],
+    }
+
+
+def tournament_ranking(designs: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Рейтинговая таблица турнира. В паре побеждает тот, кто наносит цели
+    большую перегрузку, чем получает от ее ответного удара.
+    Сортировка: победы, затем средний перевес по перегрузке.
+    """
+    result = run_tournament(designs)
+    dealt = result["g_dealt"]
+    received = dealt.T  # received[i, j] - перегрузка i от удара j
+    n = len(result["names"])
+    opponents = ~np.eye(n, dtype=bool)
+    n_opp = max(n - 1, 1)
+    
+    wins = ((dealt > received) & opponents).sum(axis=1)
+    losses = ((dealt < received) & opponents).sum(axis=1)
+    margin = np.where(opponents, dealt - received, 0.0).sum(axis=1) / n_opp
+    
+    ranking = pd.DataFrame({
+        "name": result["names"],
+        "wins": wins,
+        "losses": losses,
+        "draws": (n - 1) - wins - losses,
+        "win_rate": wins / n_opp,
+        "g_margin": margin,
+        "g_dealt_avg": np.where(opponents, dealt, 0.0).sum(axis=1) / n_opp,
+        "g_received_avg": np.where(opponents, received, 0.0).sum(axis=1) / n_opp,
+        "recoil_kmh_avg": np.where(opponents, result["recoil_kmh"], 0.0).sum(axis=1) / n_opp,
+        "energy_kj": result["energy_kj"],
+        "total_mass": result["mass"],
+    })
+    ranking = ranking.sort_values(["wins", "g_margin"], ascending=False, kind="stable")
+    ranking.insert(0, "rank", np.arange(1, n + 1))
+    return ranking.reset_index(drop=True)
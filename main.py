@@ -3,12 +3,12 @@ import streamlit as st
 
 # ... (Импорты остаются те же)
 from physics import (
-    run_static_calculations,
-    simulate_full_system,
-    analyze_collision,
-    aggregate_sim_stats,
+    collision_matrix,
+    OPPONENT_CLASSES,
     generate_report,
-    run_monte_carlo_simulation, # Новый импорт
+    run_monte_carlo_stream,
+    run_paired_monte_carlo,
+    MC_SAMPLERS,
 )
 from styles import (
     setup_page,
@@ -18,15 +18,28 @@ from styles import (
     render_drive_plot,
     render_thermal_plot,
     render_parameter_scan_plots,
+    render_grid_scan_plot,
     render_comparison_view,
+    render_tournament_table,
     render_sidebar_preview,
     render_optimization_progress,
-    render_monte_carlo_plot, # Новый импорт
+    render_monte_carlo_stream,
+    render_sensitivity_plot,
+    render_paired_monte_carlo,
 )
 from analysis import (
     SCANNABLE_PARAMS,
     run_parameter_scan,
+    run_grid_scan,
+    run_adaptive_scan,
     get_optimal_range,
+    SCAN_METRICS,
+    SCORE_CRITERIA,
+    DEFAULT_SCORE_WEIGHTS,
+)
+from sensitivity import (
+    SENSITIVITY_OUTPUTS,
+    run_sensitivity_analysis,
 )
 from comparison import (
     init_comparison_state,
@@ -34,29 +47,21 @@ from comparison import (
     get_saved_configs,
     clear_saved_configs,
     get_comparison_data,
+    tournament_ranking,
 )
 from optimizer import (
     RobotOptimizer,
     get_default_bounds,
     parse_optimized_params,
 )
+from pipeline import build_robot_pipeline
+from result_store import input_hash
 from manual import show_manual
 # Импорт базы данных компонентов
 from library_data import MOTORS_DB, BATTERIES_DB
 
 ROBOT_LIMIT_KG = 110.0
 
-@st.cache_data(ttl=60)
-def cached_static_calc(
-    voltage_s, motor_kv, gear_ratio, wheel_dia_mm,
-    weapon_mass_kg, weapon_radius_mm, armor_thickness, armor_coverage,
-    _other_params_hash
-):
-    inputs = st.session_state.get("full_inputs", {})
-    if not inputs:
-        return None
-    return run_static_calculations(inputs)
-
 
 def build_sidebar():
     st.sidebar.title("🦖 1T Rex – Конфигуратор")
@@ -173,8 +178,6 @@ def build_sidebar():
         "armor_area_total": armor_area_total,
     }
     
-    st.session_state["full_inputs"] = inputs
-
     return inputs, base_drive_mass, base_elec_mass, base_frame_mass
 
 
@@ -189,43 +192,14 @@ def main():
     inputs, base_drive_mass, base_elec_mass, base_frame_mass = build_sidebar()
 
     # --------- Расчеты ---------
-    other_params = f"{inputs['battery_ir_mohm']}_{inputs['drive_motor_count']}"
-    static_res = cached_static_calc(
-        inputs["voltage_s"], inputs["motor_kv"], inputs["gear_ratio"],
-        inputs["wheel_dia_mm"], inputs["weapon_mass_kg"], inputs["weapon_radius_mm"],
-        inputs["armor_thickness"], inputs["armor_coverage"],
-        other_params
-    )
-    
-    if static_res is None:
-        static_res = run_static_calculations(inputs)
-
-    sim_params = {
-        "voltage_nom": static_res["voltage_nom"],
-        "battery_ir_mohm": inputs["battery_ir_mohm"],
-        "drive_motor_count": inputs["drive_motor_count"],
-        "motor_kv": inputs["motor_kv"],
-        "gear_ratio": inputs["gear_ratio"],
-        "wheel_dia_mm": inputs["wheel_dia_mm"],
-        "friction_coeff": inputs["friction_coeff"],
-        "esc_current_limit_drive": inputs["esc_current_limit_drive"],
-        "simulate_weapon": inputs["simulate_weapon"],
-        "weapon_motor_count": inputs["weapon_motor_count"],
-        "weapon_motor_kv": inputs["weapon_motor_kv"],
-        "weapon_reduction": inputs["weapon_reduction"],
-        "weapon_inertia": static_res["weapon_inertia"],
-        "esc_current_limit_weapon": inputs["esc_current_limit_weapon"],
-    }
-
-    df_sim = simulate_full_system(sim_params, static_res["total_mass"], max_time=8.0)
-    sim_stats = aggregate_sim_stats(df_sim)
-    
-    collision = analyze_collision(
-        static_res["total_mass"],
-        static_res["weapon_inertia"],
-        static_res["weapon_rpm"],
-        target_mass=110.0,
-    )
+    # Конвейер pipeline: при перерисовке пересчитываются только стадии, чьи входы изменились
+    if "pipeline" not in st.session_state:
+        st.session_state.pipeline = build_robot_pipeline()
+    results = st.session_state.pipeline.run(inputs)
+    static_res = results["static"]
+    # Метрики считаются сразу (сайдбар, KPI, паспорт), траектория - потоком во вкладке "Динамика"
+    sim_stats = results["sim_stats"]
+    collision = results["collision"]
 
     render_sidebar_preview(static_res, sim_stats)
     st.sidebar.markdown("---")
@@ -273,11 +247,13 @@ def main():
 
     with tabs[1]:
         st.subheader("Разгон и нагрузка на батарею")
-        render_drive_plot(df_sim)
+        # Траектория - стадия конвейера: поток только при пересчете, иначе готовый результат
+        trajectory = results["trajectory"]
+        sim_result = render_drive_plot(trajectory.result if trajectory.done else trajectory)
 
     with tabs[2]:
         st.subheader("Тепловой режим моторов")
-        render_thermal_plot(df_sim)
+        render_thermal_plot(sim_result)
 
     with tabs[3]:
         st.subheader("Столкновение")
@@ -289,46 +265,77 @@ def main():
             st.metric("G-force (свой)", f"{collision['g_force_self']:.1f} G")
             st.metric("G-force (цель)", f"{collision['g_force_target']:.1f} G")
 
+        st.markdown("**Против весовых категорий**")
+        grid = collision_matrix(
+            static_res["total_mass"], static_res["weapon_inertia"], static_res["weapon_rpm"],
+            list(OPPONENT_CLASSES.values())
+        )
+        st.dataframe({
+            "Соперник": [f"{name} ({mass:g} кг)" for name, mass in OPPONENT_CLASSES.items()],
+            "Сила, кН": grid["impact_force_kn"][0].round(1),
+            "G-force (свой)": grid["g_force_self"][0].round(1),
+            "G-force (цель)": grid["g_force_target"][0].round(1),
+            "Отскок, км/ч": grid["recoil_speed_kmh"][0].round(1),
+        }, hide_index=True, use_container_width=True)
+
     # НОВАЯ ВКЛАДКА: Вероятность (Монте-Карло)
     with tabs[4]:
         st.header("🎲 Анализ неопределенности (Monte Carlo)")
         st.markdown("""
         Реальные параметры робота всегда отличаются от идеальных. Трение меняется, 
         моторы имеют разброс KV, батареи разряжаются по-разному.
-        Этот модуль запускает **100 симуляций** с небольшими случайными отклонениями, 
+        Этот модуль запускает **серию симуляций** с небольшими случайными отклонениями (до заданной точности), 
         чтобы показать реальный диапазон характеристик.
         """)
         
         mc_col1, mc_col2 = st.columns(2)
         with mc_col1:
             mc_variation = st.slider("Разброс параметров (±%)", 5, 20, 10, 5)
+            mc_sampler = st.selectbox(
+                "Схема выборки", MC_SAMPLERS,
+                format_func=lambda x: {"random": "Случайная", "sobol": "Соболь (QMC)", "lhs": "Латинский гиперкуб"}[x],
+                help="Соболь и гиперкуб покрывают пространство параметров равномернее: та же точность за меньшее число симуляций"
+            )
         with mc_col2:
-            mc_iters = st.slider("Количество симуляций", 50, 500, 100, 50)
+            mc_iters = st.slider("Количество симуляций (максимум)", 50, 2000, 500, 50)
+            mc_ci_pct = st.slider(
+                "Автостоп: ширина 95% ДИ (% от среднего)", 0.0, 2.0, 0.5, 0.1,
+                help="Расчет останавливается, когда ДИ пикового тока и скорости сузились до этой ширины. 0 - без автостопа"
+            )
+        mc_weapon = st.checkbox(
+            "Учитывать оружие", value=inputs["simulate_weapon"], disabled=not inputs["simulate_weapon"],
+            help="Варьируются KV и лимит ESC оружия и инерция ротора; ток раскрутки входит в пиковый ток батареи"
+        )
             
         if st.button("🎲 Запустить Монте-Карло"):
-            with st.spinner(f"Выполняем {mc_iters} симуляций..."):
-                df_mc = run_monte_carlo_simulation(
+            st.subheader("Результаты анализа")
+            st.caption("Графики обновляются по мере расчета. Прервать: кнопка Stop Streamlit или изменение настроек.")
+            status = st.empty()
+            
+            # Поток чанков: гистограммы и ДИ дорисовываются, выборка не копится в расчете
+            last = render_monte_carlo_stream(
+                run_monte_carlo_stream(
                     inputs, 
                     static_res, 
                     variation_pct=mc_variation/100.0, 
-                    iterations=mc_iters
-                )
-                
-                st.subheader("Результаты анализа")
-                
-                # График 1: Ток
-                mean_curr, std_curr = render_monte_carlo_plot(
-                    df_mc, "peak_current", "Распределение пикового тока", "А"
-                )
-                st.info(f"Средний ток: **{mean_curr:.1f} А**. С вероятностью 95% он будет в диапазоне **{mean_curr-2*std_curr:.0f} ... {mean_curr+2*std_curr:.0f} А**.")
-                
-                st.markdown("---")
-                
-                # График 2: Скорость
-                mean_spd, std_spd = render_monte_carlo_plot(
-                    df_mc, "max_speed", "Распределение максимальной скорости", "км/ч"
-                )
-                st.info(f"Средняя скорость: **{mean_spd:.1f} км/ч**. Доверительный интервал: **{mean_spd-2*std_spd:.1f} ... {mean_spd+2*std_spd:.1f} км/ч**.")
+                    iterations=mc_iters,
+                    sampler=mc_sampler,
+                    ci_width=mc_ci_pct/100.0 if mc_ci_pct > 0 else None,
+                    include_weapon=mc_weapon,
+                    workers=-1  # все ядра; результат от числа процессов не зависит
+                ),
+                [
+                    ("peak_current", "Распределение пикового тока", "А"),
+                    ("max_speed", "Распределение максимальной скорости", "км/ч"),
+                ] + ([("weapon_spinup_time", "Распределение времени раскрутки оружия", "с")] if mc_weapon else [])
+            )
+            
+            if last is not None:
+                ci_text = ", ".join(f"{key}: ±{val*50:.2f}%" for key, val in last["ci_width"].items() if val < float("inf"))
+                if last["converged"]:
+                    status.success(f"Точность достигнута за **{last['done']}** симуляций ({ci_text})")
+                else:
+                    status.caption(f"Выполнено {last['done']} симуляций. 95% ДИ среднего: {ci_text or 'недостаточно данных'}")
 
     with tabs[5]:
         st.header("🔬 Параметрическое сканирование")
@@ -339,20 +346,101 @@ def main():
         with col_range:
             st.write(f"Диапазон: {param_info['range'][0]} – {param_info['range'][1]} {param_info['unit']}")
             num_points = st.slider("Точки", 10, 30, 15)
+            adaptive_scan = st.checkbox(
+                "Адаптивно", True,
+                help="Сначала грубая сетка, затем точки добавляются у оптимума и там, где кривые резко меняются"
+            )
         
         if st.button("▶️ Запустить сканирование"):
             with st.spinner("Анализ..."):
-                df_scan = run_parameter_scan(inputs, selected_param, param_info["range"], num_points)
+                if adaptive_scan:
+                    df_scan = run_adaptive_scan(inputs, selected_param, param_info["range"], max_points=num_points)
+                else:
+                    df_scan = run_parameter_scan(inputs, selected_param, param_info["range"], num_points)
                 st.session_state["scan_result"] = df_scan
                 st.session_state["scan_param"] = selected_param
         
+        # Веса общего балла: пересчет рекомендации по готовым метрикам, без симуляций
+        with st.expander("⚖️ Веса критериев"):
+            weight_cols = st.columns(len(SCORE_CRITERIA))
+            score_weights = {}
+            for col, metric in zip(weight_cols, SCORE_CRITERIA):
+                with col:
+                    score_weights[metric] = st.slider(
+                        SCAN_METRICS[metric][0], 0.0, 1.0, DEFAULT_SCORE_WEIGHTS[metric], 0.05, key=f"w_{metric}"
+                    )
+        
         if "scan_result" in st.session_state:
             df_scan = st.session_state["scan_result"]
             scan_param = st.session_state["scan_param"]
             param_info = SCANNABLE_PARAMS[scan_param]
             render_parameter_scan_plots(df_scan, param_info["name"], param_info["unit"])
-            optimal = get_optimal_range(df_scan, scan_param)
+            optimal = get_optimal_range(df_scan, scan_param, score_weights)
             st.success(f"Рекомендуемое: {optimal['optimal_value']:.2f} {param_info['unit']}")
+            st.caption(f"Парето-оптимальных точек: {int(optimal['scores']['pareto'].sum())} из {len(df_scan)}")
+
+        st.markdown("---")
+        st.subheader("🗺️ Сетка из двух параметров")
+        param_keys = list(SCANNABLE_PARAMS.keys())
+        col_gx, col_gy, col_gn = st.columns(3)
+        with col_gx:
+            grid_x = st.selectbox("Ось X", param_keys, format_func=lambda x: SCANNABLE_PARAMS[x]["name"], key="grid_x")
+        with col_gy:
+            grid_y = st.selectbox("Ось Y", [p for p in param_keys if p != grid_x], format_func=lambda x: SCANNABLE_PARAMS[x]["name"], key="grid_y")
+        with col_gn:
+            grid_points = st.slider("Точек на ось", 5, 40, 30, key="grid_points")
+        
+        if st.button("🗺️ Запустить сетку"):
+            with st.spinner(f"Выполняем {grid_points ** 2} расчетов..."):
+                st.session_state["grid_result"] = run_grid_scan(
+                    inputs, {p: SCANNABLE_PARAMS[p]["range"] for p in (grid_x, grid_y)}, grid_points
+                )
+        
+        if "grid_result" in st.session_state:
+            df_grid = st.session_state["grid_result"]
+            gx, gy = list(df_grid.attrs["axes"])
+            grid_opt = get_optimal_range(df_grid, gx, score_weights)
+            grid_titles = {"total_score": "Общий балл", **{m: name for m, (name, _) in SCAN_METRICS.items()}}
+            col_gm, col_gc = st.columns([3, 1])
+            with col_gm:
+                grid_metric = st.selectbox("Метрика", list(grid_titles), format_func=grid_titles.get, key="grid_metric")
+            with col_gc:
+                grid_contour = st.checkbox("Изолинии", False, key="grid_contour")
+            labels = {p: f"{SCANNABLE_PARAMS[p]['name']} ({SCANNABLE_PARAMS[p]['unit']})" for p in (gx, gy)}
+            labels.update({m: f"{name} ({unit})" for m, (name, unit) in SCAN_METRICS.items()})
+            labels["total_score"] = grid_titles["total_score"]
+            render_grid_scan_plot(
+                grid_opt["scores"], gx, gy, grid_metric, grid_titles[grid_metric], labels,
+                contour=grid_contour, highlight="pareto"
+            )
+            best = ", ".join(
+                f"{SCANNABLE_PARAMS[p]['name']} {v:.2f} {SCANNABLE_PARAMS[p]['unit']}"
+                for p, v in grid_opt["optimal_value"].items()
+            )
+            st.success(f"Рекомендуемое: {best}")
+            st.caption(f"Парето-оптимальных точек (отмечены): {int(grid_opt['scores']['pareto'].sum())} из {len(df_grid)}")
+
+        st.markdown("---")
+        st.subheader("🌐 Глобальная чувствительность (индексы Соболя)")
+        st.caption(
+            "Все параметры варьируются одновременно по своим диапазонам. S1 - доля разброса "
+            "выхода от параметра в одиночку, ST - вместе с взаимодействиями."
+        )
+        sens_n = st.select_slider("Базовая выборка", [256, 512, 1024, 2048], value=1024,
+                                  help=f"Расчетов: N × {len(SCANNABLE_PARAMS) + 2}")
+        if st.button("🌐 Рассчитать индексы"):
+            with st.spinner(f"Выполняем {sens_n * (len(SCANNABLE_PARAMS) + 2)} расчетов..."):
+                st.session_state["sensitivity_result"] = run_sensitivity_analysis(inputs, n_base=sens_n)
+        
+        if "sensitivity_result" in st.session_state:
+            sens_output = st.selectbox(
+                "Выход", list(SENSITIVITY_OUTPUTS),
+                format_func=lambda x: SENSITIVITY_OUTPUTS[x][0]
+            )
+            render_sensitivity_plot(
+                st.session_state["sensitivity_result"], sens_output,
+                f"{SENSITIVITY_OUTPUTS[sens_output][0]}: вклад параметров"
+            )
 
     with tabs[6]:
         st.header("⚖️ Сравнение")
@@ -381,6 +469,37 @@ def main():
             if config_a and config_b:
                 comparison = get_comparison_data(config_a, config_b)
                 render_comparison_view(config_a, config_b, comparison)
+                
+                # Парный Монте-Карло: A и B на одних и тех же возмущениях
+                inputs_b = inputs if use_live else config_b.get("inputs")
+                if config_a.get("inputs") and inputs_b:
+                    st.markdown("---")
+                    st.subheader("🎲 Парный Монте-Карло")
+                    st.caption("Обе конфигурации получают одинаковые случайные отклонения, поэтому разница видна даже при малом числе итераций.")
+                    col_p1, col_p2 = st.columns(2)
+                    with col_p1: pair_iter = st.slider("Итераций", 50, 2000, 500, step=50, key="pair_iter")
+                    with col_p2: pair_var = st.slider("Разброс (%)", 1, 20, 10, key="pair_var") / 100.0
+                    # Результат привязан к паре и настройкам: после смены A/B старый не показываем
+                    pair_key = input_hash(config_a["name"], config_b["name"], config_a["inputs"], inputs_b, pair_var, pair_iter)
+                    if st.button("Сравнить с разбросом", key="pair_run"):
+                        with st.spinner("Парная симуляция..."):
+                            st.session_state["paired_mc_result"] = (pair_key, run_paired_monte_carlo(
+                                config_a["inputs"], inputs_b, pair_var, pair_iter
+                            ))
+                    stored_pair = st.session_state.get("paired_mc_result")
+                    if stored_pair is not None and stored_pair[0] == pair_key:
+                        render_paired_monte_carlo(
+                            stored_pair[1],
+                            [("max_speed", "Скорость", "км/ч"), ("peak_current", "Пиковый ток", "А"), ("time_to_20", "Разгон до 20 км/ч", "с")],
+                            config_a["name"], config_b["name"]
+                        )
+            
+            # Турнир: удары каждого по каждому (сохраненные + текущая при LIVE)
+            participants = saved_configs + ([{"name": "⚡ LIVE", "inputs": inputs}] if use_live else [])
+            if len(participants) >= 2:
+                st.markdown("---")
+                st.subheader("🏆 Турнир")
+                render_tournament_table(tournament_ranking(participants))
 
     with tabs[7]:
         st.header("🤖 Оптимизатор")
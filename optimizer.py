@@ -2,24 +2,40 @@
 Модуль автоматической оптимизации параметров робота.
 Использует scipy.optimize для поиска оптимальных конфигураций.
 """
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
 import numpy as np
 from scipy.optimize import differential_evolution, OptimizeResult
 from typing import Dict, List, Tuple, Callable
-from physics import run_static_calculations, simulate_full_system, aggregate_sim_stats, analyze_collision
+from physics import (
+    run_static_calculations,
+    simulate_full_system,
+    analyze_collision,
+    RESULT_STORE,
+)
 
 
-class RobotOptimizer:
-    """Оптимизатор параметров боевого робота."""
+class OptimizationObjective:
+    """
+    Целевая функция для минимизации (чем меньше, тем лучше конфигурация).
+    Без побочных эффектов и picklable: differential_evolution может считать
+    популяцию на пуле процессов. Запись для истории возвращает evaluate.
+    """
     
-    def __init__(self, base_inputs: Dict):
-        self.base_inputs = base_inputs.copy()
-        self.optimization_history = []
+    def __init__(self, base_inputs: Dict, goals: Dict, constraints: Dict):
+        self.base_inputs = base_inputs
+        self.goals = goals
+        self.constraints = constraints
+    
+    def __call__(self, params: np.ndarray) -> float:
+        return self.evaluate(params)["score"]
+    
+    def evaluate(self, params: np.ndarray) -> Dict:
+        """Балл и метрики конфигурации (штрафные баллы - без метрик)."""
+        goals, constraints = self.goals, self.constraints
         
-    def objective_function(self, params: np.ndarray, goals: Dict, constraints: Dict) -> float:
-        """
-        Целевая функция для минимизации.
-        Чем меньше значение, тем лучше конфигурация.
-        """
         # Распаковка параметров
         gear_ratio, wheel_dia, motor_kv, weapon_mass, armor_thick = params
         
@@ -37,7 +53,7 @@ class RobotOptimizer:
             
             # Проверка жестких ограничений
             if static_res["total_mass"] > constraints["max_mass"]:
-                return 1e6  # Штраф за перевес
+                return {"params": params.copy(), "score": 1e6}  # Штраф за перевес
             
             # Быстрая симуляция для оценки динамики
             sim_params = {
@@ -57,8 +73,10 @@ class RobotOptimizer:
                 "esc_current_limit_weapon": inputs["esc_current_limit_weapon"],
             }
             
-            df_sim = simulate_full_system(sim_params, static_res["total_mass"], max_time=4.0)
-            sim_stats = aggregate_sim_stats(df_sim)
+            sim_stats = simulate_full_system(
+                sim_params, static_res["total_mass"], max_time=4.0,
+                stats_only=True
+            )
             
             collision = analyze_collision(
                 static_res["total_mass"],
@@ -68,7 +86,7 @@ class RobotOptimizer:
             
             # Проверка мягких ограничений
             if sim_stats["peak_current"] > constraints["max_current"]:
-                return 1e5  # Штраф за превышение тока
+                return {"params": params.copy(), "score": 1e5}  # Штраф за превышение тока
             
             # Расчет целевой функции (инвертированная полезность)
             score = 0.0
@@ -93,8 +111,7 @@ class RobotOptimizer:
             if goals.get("minimize_gforce", False):
                 score += collision["g_force_self"] * goals.get("gforce_weight", 1.0)
             
-            # Сохранение истории
-            self.optimization_history.append({
+            return {
                 "params": params.copy(),
                 "score": score,
                 "speed": static_res["speed_kmh"],
@@ -102,19 +119,101 @@ class RobotOptimizer:
                 "energy": static_res["weapon_energy"] / 1000,
                 "current": sim_stats["peak_current"],
                 "gforce": collision["g_force_self"]
-            })
-            
-            return score
+            }
             
         except Exception as e:
-            return 1e7  # Штраф за ошибку расчета
+            return {"params": params.copy(), "score": 1e7}  # Штраф за ошибку расчета
+
+
+class _HistoryMap:
+    """
+    map для workers= differential_evolution: популяция считается objective.evaluate
+    (на пуле процессов или в текущем), записи копятся в history родительского
+    процесса, оптимизатору отдаются баллы в том же порядке.
+    """
+    
+    def __init__(
+        self,
+        objective: OptimizationObjective,
+        history: List[Dict],
+        pool: ProcessPoolExecutor = None,
+        workers: int = 1
+    ):
+        self.objective = objective
+        self.history = history
+        self.pool = pool
+        self.workers = workers
+    
+    def __call__(self, func: Callable, population) -> List[float]:
+        # func - обертка scipy над тем же objective; считаем evaluate, чтобы получить и метрики
+        population = list(population)
+        if self.pool is None:
+            records = [self.objective.evaluate(x) for x in population]
+        else:
+            chunksize = max(len(population) // self.workers, 1)
+            records = list(self.pool.map(self.objective.evaluate, population, chunksize=chunksize))
+        self.history.extend(records)
+        return [record["score"] for record in records]
+
+
+def run_differential_evolution(
+    objective: OptimizationObjective,
+    bounds: List[Tuple[float, float]],
+    max_iterations: int = 50,
+    workers: int = -1,
+    **options
+) -> Tuple[OptimizeResult, List[Dict]]:
+    """
+    differential_evolution с расчетом популяции на workers процессах (-1 - все ядра).
+    Возвращает результат и записи objective.evaluate по всем точкам популяций
+    в порядке расчета; от числа процессов не зависит ни то, ни другое.
+    options - переопределение прочих аргументов differential_evolution.
+    """
+    workers = (os.cpu_count() or 1) if workers is None or workers < 0 else max(int(workers), 1)
+    history = []
+    
+    # updating='deferred': поколение считается целиком - его и раздаем процессам
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        result = differential_evolution(**{
+            "func": objective,
+            "bounds": bounds,
+            "maxiter": max_iterations,
+            "popsize": 10,
+            "tol": 0.01,
+            "atol": 0.001,
+            "seed": 42,
+            "workers": _HistoryMap(objective, history, pool, workers),
+            "updating": "deferred",
+            "disp": False,
+            **options,
+        })
+    return result, history
+
+
+class RobotOptimizer:
+    """Оптимизатор параметров боевого робота."""
+    
+    def __init__(self, base_inputs: Dict):
+        self.base_inputs = base_inputs.copy()
+        self.optimization_history = []
+        
+    def objective_function(self, params: np.ndarray, goals: Dict, constraints: Dict) -> float:
+        """
+        Целевая функция для минимизации (см. OptimizationObjective).
+        Чем меньше значение, тем лучше конфигурация.
+        """
+        record = OptimizationObjective(self.base_inputs, goals, constraints).evaluate(params)
+        if "speed" in record:
+            self.optimization_history.append(record)
+        return record["score"]
     
     def optimize(
         self,
         goals: Dict,
         constraints: Dict,
         bounds: List[Tuple[float, float]],
-        max_iterations: int = 50
+        max_iterations: int = 50,
+        workers: int = -1
     ) -> OptimizeResult:
         """
         Запуск оптимизации.
@@ -124,25 +223,31 @@ class RobotOptimizer:
             constraints: Ограничения (max_mass, max_current)
             bounds: Границы параметров [(min, max), ...]
             max_iterations: Максимальное количество итераций
+            workers: Число процессов для расчета популяции (-1 - все ядра);
+                на результат не влияет
         
         Returns:
             OptimizeResult: Результат оптимизации
         """
-        self.optimization_history = []
+        # Повторный запуск с теми же входами берется из хранилища вместе с историей
+        store_inputs = {
+            "base_inputs": self.base_inputs,
+            "goals": goals,
+            "constraints": constraints,
+            "bounds": bounds,
+            "max_iterations": max_iterations,
+        }
+        stored = RESULT_STORE.get("optimizer", store_inputs)
+        if stored is not None:
+            result, self.optimization_history = stored
+            return result
         
-        result = differential_evolution(
-            func=lambda x: self.objective_function(x, goals, constraints),
-            bounds=bounds,
-            maxiter=max_iterations,
-            popsize=10,
-            tol=0.01,
-            atol=0.001,
-            seed=42,
-            workers=1,
-            updating='deferred',
-            disp=False
-        )
+        objective = OptimizationObjective(self.base_inputs, goals, constraints)
+        result, history = run_differential_evolution(objective, bounds, max_iterations, workers)
         
+        # Штрафные точки в историю не попадают (метрик у них нет)
+        self.optimization_history = [record for record in history if "speed" in record]
+        RESULT_STORE.put("optimizer", store_inputs, (result, self.optimization_history))
         return result
     
     def get_history(self) -> List[Dict]:
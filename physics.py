@@ -1,14 +1,151 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+import warnings
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from scipy.special import ndtri
+from scipy.stats import qmc, t as student_t
+from typing import Any, Callable, Dict, List, Tuple
+import physics_jit
+from result_store import ResultStore, input_hash
+from running_stats import RunningStats, RunningHistogram, DEFAULT_QUANTILES
 
 # Константы
 G = 9.81  # ускорение свободного падения, м/с^2
+ACCEL_TARGET_KMH = 20.0  # скорость для метрики "время разгона"
+
+# Подбор сечения провода по току (табличное): (порог тока, сечение)
+WIRE_GAUGES = ((50, "12 AWG"), (80, "10 AWG"), (150, "8 AWG"))
+WIRE_GAUGE_MAX = "6 AWG (или шина)"
+
+# Ключи итоговых метрик симуляции (aggregate_sim_stats / stats_only)
+SIM_STAT_KEYS = (
+    "peak_current", "min_voltage", "temp_drive_max", "temp_weap_max",
+    "max_speed", "time_to_20",
+)
+
+# Детектор установившегося режима для пакетных расчетов (stats_only):
+# относительный допуск по скорости и току ходовой и длина окна, с
+STEADY_STATE_TOL = 1e-4
+STEADY_STATE_WINDOW = 0.5
+# Батч сжимается, когда установившихся строк не меньше этой доли (сжатие дороже шагов)
+STEADY_COMPACT_FRACTION = 0.5
+
+# Интеграторы: "euler" - исходная схема (шаг 0.05 с), "rk4" - классический
+# Рунге-Кутта с фиксированным шагом, "rk23" - адаптивный с контролем ошибки,
+# "analytic" - кусочно-аналитическое решение по режимам (см. _simulate_analytic).
+# analytic точен (без ошибки шага), но считает сетку вывода и квадратуру нагрева и при
+# stats_only: на одной конфигурации он ~10x медленнее euler на numba, поэтому
+# горячие циклы (оптимизатор) идут по умолчанию - через euler
+INTEGRATORS = ("euler", "rk4", "rk23", "analytic")
+RK4_DT = 0.1
+RK23_MAX_DT = 0.5
+RK_RTOL = 2e-3
+ANALYTIC_DT = 0.05  # шаг сетки вывода и квадратуры нагрева
+STREAM_CHUNK_STEPS = 20  # шагов в чанке simulate_full_system_stream (1 с при dt = 0.05)
+
+# Предел суммарного размера кэша результатов (RESULT_CACHE), байт
+RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Монте-Карло: итерации режутся примерно на MC_TARGET_CHUNKS чанков (размер - степень
+# двойки от MC_MIN_CHUNK_SIZE до MC_CHUNK_SIZE), у каждого чанка свой поток случайных
+# чисел (SeedSequence.spawn). Разбиение зависит только от числа итераций, а не от
+# числа процессов и машины - результат воспроизводим
+MC_CHUNK_SIZE = 128
+MC_MIN_CHUNK_SIZE = 16
+MC_TARGET_CHUNKS = 32
+MC_SEED = 42
+
+# Схемы выборки Монте-Карло: "random" - псевдослучайная, "sobol" - скремблированная
+# последовательность Соболя, "lhs" - латинский гиперкуб. Для sobol/lhs каждый чанк -
+# независимая рандомизация (реплика), ДИ считается по разбросу средних реплик.
+MC_SAMPLERS = ("random", "sobol", "lhs")
+MC_CI_KEYS = ("peak_current", "max_speed")  # метрики критерия останова
+MC_CI_LEVEL = 0.95
+MC_MIN_REPLICATES = 3  # меньше реплик - квантиль Стьюдента слишком велик
+MC_STREAM_KEYS = ("peak_current", "max_speed", "time_to_20")  # бегущие статистики потока
+MC_COLUMNS = ("iteration", "kv_used", "friction_used") + MC_STREAM_KEYS  # time_to_20 = 4.0 - не достиг
+MC_PAIRED_METRICS = {"max_speed": True, "peak_current": False, "time_to_20": False}  # True - больше = лучше
+MC_WEAPON_KEYS = ("weapon_spinup_time", "temp_weap_max")  # бегущие статистики с оружием
+MC_WEAPON_COLUMNS = (
+    "weapon_kv_used", "weapon_limit_used", "weapon_inertia_used", "min_voltage"
+) + MC_WEAPON_KEYS
+
+# Весовые категории соперников для матрицы столкновений, кг
+OPPONENT_CLASSES = {"Легкий": 55.0, "Средний": 110.0, "Тяжелый": 250.0}
+
+# Раскрутка оружия: ток ограничения ESC до выхода ротора на долю WEAPON_SPINUP_FRACTION
+# свободных оборотов, затем ток поддержания. Время считает weapon_spinup_time
+# (в params симуляции - "weapon_spinup_s", его передает Монте-Карло с оружием);
+# без weapon_spinup_s в params - прежнее допущение WEAPON_SPINUP_S, на нем
+# остается детерминированный расчет приложения.
+WEAPON_SPINUP_S = 3.0
+WEAPON_SPINUP_FRACTION = 0.95
+
+# Версия физической модели: увеличивать при любом изменении формул или
+# допущений - сохраненные на диске результаты (RESULT_STORE) старой версии удаляются
+# 2 - Монте-Карло на потоках чанков (SeedSequence.spawn) вместо одного default_rng(42)
+# 3 - время раскрутки оружия из физики ротора вместо фиксированных 3 с
+# 4 - размер чанка Монте-Карло зависит от числа итераций (_mc_chunk_size)
+# 5 - метрика скана traction_current
+MODEL_VERSION = 5
+RESULT_STORE = ResultStore(model_version=MODEL_VERSION)
+
+# Реализация шага Эйлера: "python" или "numba" (ядро physics_jit), "auto" - numba,
+# если установлена (необязательная зависимость, см. requirements.txt). При импорте
+# выбирается бэкенд из переменной окружения ROBOT_BACKEND (по умолчанию "auto"),
+# дальше переключается set_backend; на результаты не влияет.
+BACKENDS = ("auto", "python", "numba")
+_backend = "python"
+# Батч от JIT_PARALLEL_MIN_ROWS строк шагается на потоках numba (если их больше
+# одного) блоками по JIT_PARALLEL_BLOCK строк; меньшие - чанки Монте-Карло,
+# которые и так идут на пуле процессов, - последовательно
+JIT_PARALLEL_MIN_ROWS = 256
+JIT_PARALLEL_BLOCK = 64
+
+
+def set_backend(name: str = "auto") -> str:
+    """Выбор бэкенда симуляции (см. BACKENDS). Возвращает фактически выбранный."""
+    global _backend
+    if name == "auto":
+        name = "numba" if physics_jit.NUMBA_AVAILABLE else "python"
+    elif name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд: {name}")
+    elif name == "numba" and not physics_jit.NUMBA_AVAILABLE:
+        raise ImportError("Бэкенд numba недоступен: пакет numba не установлен")
+    _backend = name
+    return name
+
+
+def get_backend() -> str:
+    """Текущий бэкенд симуляции ("python" или "numba")."""
+    return _backend
+
+
+def batch_steady_state_tol():
+    """
+    steady_state_tol для батчевых stats_only-прогонов (Монте-Карло, сканы):
+    STEADY_STATE_TOL на numba, None на Python - там на горизонте Монте-Карло (4 с)
+    проверки и аналитический хвост съедают сэкономленные шаги
+    (см. benchmarks.benchmark_steady_state).
+    """
+    return STEADY_STATE_TOL if _backend == "numba" else None
+
+
+set_backend(os.environ.get("ROBOT_BACKEND", "auto"))
 
 def run_static_calculations(inputs: Dict) -> Dict:
     """
     Выполняет статические расчеты параметров робота.
+    inputs - dict скаляров либо колоночный батч (dict массивов или DataFrame):
+    тогда формулы считаются сразу для всех конфигураций с броадкастингом,
+    а simulate_weapon работает как маска (массивы длины N на выходе).
     """
+    if isinstance(inputs, pd.DataFrame):
+        inputs = {key: inputs[key].to_numpy() for key in inputs.columns}
+    
     # 1. Напряжение
     voltage_nom = inputs["voltage_s"] * 3.7  # номинал LiPo/LiIon
     
@@ -49,15 +186,26 @@ def run_static_calculations(inputs: Dict) -> Dict:
     weapon_tip_speed = 0.0
     weapon_inertia = 0.0
     
-    if inputs["simulate_weapon"]:
-        weapon_rpm = (inputs["weapon_motor_kv"] * voltage_nom) / inputs["weapon_reduction"]
-        # Момент инерции кольца/диска: I = 0.5 * m * r^2
-        r_m = inputs["weapon_radius_mm"] / 1000.0
-        weapon_inertia = 0.5 * inputs["weapon_mass_kg"] * (r_m ** 2)
-        # Кинетическая энергия: E = 0.5 * I * w^2, где w - рад/с
-        w_rad_s = weapon_rpm * 2 * np.pi / 60.0
-        weapon_energy = 0.5 * weapon_inertia * (w_rad_s ** 2)
-        weapon_tip_speed = w_rad_s * r_m * 3.6 # км/ч
+    sim_weapon = inputs["simulate_weapon"]
+    batched = np.ndim(sim_weapon) > 0
+    if batched or sim_weapon:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weapon_rpm = (inputs["weapon_motor_kv"] * voltage_nom) / inputs["weapon_reduction"]
+            # Момент инерции кольца/диска: I = 0.5 * m * r^2
+            r_m = inputs["weapon_radius_mm"] / 1000.0
+            weapon_inertia = 0.5 * inputs["weapon_mass_kg"] * (r_m ** 2)
+            # Кинетическая энергия: E = 0.5 * I * w^2, где w - рад/с
+            w_rad_s = weapon_rpm * 2 * np.pi / 60.0
+            weapon_energy = 0.5 * weapon_inertia * (w_rad_s ** 2)
+            weapon_tip_speed = w_rad_s * r_m * 3.6 # км/ч
+        
+        if batched:
+            # Конфигурации без оружия - нули, как в скалярной ветке
+            mask = np.asarray(sim_weapon, dtype=bool)
+            weapon_rpm, weapon_energy, weapon_tip_speed, weapon_inertia = (
+                np.where(mask, val, 0.0)
+                for val in (weapon_rpm, weapon_energy, weapon_tip_speed, weapon_inertia)
+            )
 
     return {
         "voltage_nom": voltage_nom,
@@ -71,13 +219,309 @@ def run_static_calculations(inputs: Dict) -> Dict:
     }
 
 
-def simulate_full_system(params: Dict, total_mass_kg: float, max_time: float = 8.0) -> pd.DataFrame:
+def weapon_spinup_time(voltage, motor_kv, reduction, inertia, motor_count, esc_limit):
+    """
+    Время раскрутки ротора до WEAPON_SPINUP_FRACTION свободных оборотов, с
+    (скаляры или массивы). Модель мотора - как у ходовой: Kt = 9.55/KV,
+    фазное сопротивление 50 мОм, КПД передачи 0.8, потери ротора не учитываются.
+    1. Ток упирается в лимит ESC - момент постоянен, обороты растут линейно
+       до w1, где (U - ЭДС)/R падает до лимита.
+    2. Дальше ток (U - ЭДС)/R - экспоненциальный выход на свободные обороты
+       с постоянной времени T = J*R*KV / (n*Kt*0.8*i^2) (KV в рад/с/В, i - редукция).
+    """
+    R_phase = 0.05
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kv_rad = np.asarray(motor_kv, dtype=float) * 2 * np.pi / 60.0  # рад/с на вольт
+        kt = 9.55 / np.asarray(motor_kv, dtype=float)
+        gain = motor_count * kt * 0.8 * reduction  # момент на роторе на ампер одного мотора
+        w_free = kv_rad * voltage / reduction
+        w_target = WEAPON_SPINUP_FRACTION * w_free
+        w_limit = np.maximum(kv_rad * (voltage - esc_limit * R_phase) / reduction, 0.0)
+        
+        accel = gain * esc_limit / inertia
+        t_limited = np.minimum(w_limit, w_target) / accel
+        time_const = inertia * R_phase * kv_rad / (gain * reduction)
+        t_exp = np.where(
+            w_limit < w_target,
+            time_const * np.log((w_free - w_limit) / (w_free - w_target)),
+            0.0
+        )
+        spinup = t_limited + t_exp
+    # Нулевой ротор раскручивается мгновенно, без тока (или без моторов) - никогда
+    spinup = np.where(np.asarray(inertia) > 0, spinup, 0.0)
+    return np.where(np.isfinite(spinup), spinup, np.inf)[()]  # скаляр для скалярных входов
+
+
+class SimulationResult:
+    """
+    Результат симуляции в виде колонок NumPy (struct-of-arrays).
+
+    Колонки доступны по ключу, как у DataFrame (res["I_bat"].max()).
+    Для батча колонки имеют форму (N, T), "t" - общая ось времени (T,).
+    DataFrame строится только по запросу (графики).
+    """
+    COLUMNS = ("t", "v_kmh", "dist", "I_bat", "U_bat", "T_drive", "T_weapon")
+
+    def __init__(self, columns: Dict[str, np.ndarray], max_time: float = None):
+        self.columns = columns
+        self.max_time = max_time
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.columns[key]
+
+    def __len__(self) -> int:
+        return len(self.columns["t"])
+
+    @property
+    def batch_size(self) -> int:
+        """Количество конфигураций (1 для скалярной симуляции)."""
+        return 1 if self.columns["v_kmh"].ndim == 1 else self.columns["v_kmh"].shape[0]
+
+    def row(self, i: int) -> "SimulationResult":
+        """Траектория i-й конфигурации батча."""
+        if self.columns["v_kmh"].ndim == 1:
+            return self
+        return SimulationResult({
+            key: (col if key == "t" else col[i]) for key, col in self.columns.items()
+        }, self.max_time)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Преобразование в DataFrame (только для одной конфигурации)."""
+        return pd.DataFrame({key: self.columns[key] for key in self.COLUMNS})
+
+
+def _tail_temps(temp, power_first, power_second, n_steps: int, dt: float):
+    """
+    Нагрев мотора на n_steps шагов Эйлера вперед при мощности, чередующейся
+    power_first, power_second, ... (постоянный ток - частный случай).
+    Шаг T -> (1 - a)*T + c, где a = 0.05*dt, c = P*dt/500 + 25*a, поэтому пары шагов
+    сворачиваются в геометрическую прогрессию. Четные и нечетные шаги монотонны,
+    так что максимум достигается на их концах.
+    Возвращает (максимум на участке, температура в конце участка).
+    """
+    a = 0.05 * dt
+    c1 = power_first * dt / 500.0 + 25.0 * a
+    c2 = power_second * dt / 500.0 + 25.0 * a
+    pair_gain = (1.0 - a) ** 2
+    temp_fix = ((1.0 - a) * c1 + c2) / (1.0 - pair_gain)
+    
+    def after_pairs(m):
+        return temp_fix + (temp - temp_fix) * pair_gain ** m
+    
+    def one_step(x):
+        return (1.0 - a) * x + c1
+    
+    m_even = n_steps // 2
+    odd_last = one_step(after_pairs((n_steps - 1) // 2))
+    temp_max = np.maximum(one_step(temp), odd_last)
+    temp_max = np.where(
+        m_even >= 1, np.maximum(temp_max, np.maximum(after_pairs(1), after_pairs(m_even))), temp_max
+    )
+    temp_end = np.where(n_steps % 2 == 0, after_pairs(m_even), odd_last)
+    # Пустой участок: температура не меняется
+    return np.where(n_steps == 0, temp, temp_max), np.where(n_steps == 0, temp, temp_end)
+
+
+def _steady_tail_temps(
+    temp_drive, temp_weap, i_drive_next, i_drive_after, sim_weapon,
+    i_weap_spin, i_weap_hold, t_spinup, t_rest: np.ndarray, dt: float
+):
+    """
+    Пиковые температуры на оставшемся участке после выхода на установившийся режим.
+    Ток ходовой постоянен либо чередуется с периодом 2 шага (предельный цикл Эйлера
+    у ограничителя), ток оружия идет по профилю раскрутки - нагрев досчитывается
+    аналитически.
+    """
+    R_phase = 0.05
+    n_rest = len(t_rest)
+    # Шагов раскрутки в остатке (t_spinup - скаляр или по строке батча)
+    n_spin = np.count_nonzero(t_rest < np.expand_dims(t_spinup, -1), axis=-1)
+    
+    drive_max, _ = _tail_temps(
+        temp_drive, (i_drive_next**2) * R_phase, (i_drive_after**2) * R_phase, n_rest, dt
+    )
+    p_spin = (i_weap_spin**2) * R_phase
+    p_hold = (i_weap_hold**2) * R_phase
+    spin_max, weap_mid = _tail_temps(temp_weap, p_spin, p_spin, n_spin, dt)
+    hold_max, _ = _tail_temps(weap_mid, p_hold, p_hold, n_rest - n_spin, dt)
+    weap_max = np.where(sim_weapon, np.maximum(spin_max, hold_max), temp_weap)
+    return drive_max, weap_max
+
+
+def _is_steady(value, anchor, tol):
+    """Значение в пределах относительного допуска от опорного (скаляр или массив)."""
+    return np.abs(value - anchor) <= tol * np.maximum(np.abs(anchor), 1.0)
+
+
+def simulate_full_system(
+    params: Dict,
+    total_mass_kg: float,
+    max_time: float = 8.0,
+    stats_only: bool = False,
+    steady_state_tol: float = None,
+    steady_state_window: float = STEADY_STATE_WINDOW,
+    integrator: str = "euler",
+    dt: float = None,
+    rtol: float = RK_RTOL
+):
     """
     Симуляция разгона во времени с учетом тока и нагрева.
+    Результат пишется в заранее выделенные колонки NumPy.
+
+    stats_only=True - траектория не сохраняется: метрики aggregate_sim_stats
+    считаются на лету (O(1) памяти) и возвращаются сразу в виде dict.
+    steady_state_tol (только для stats_only) - интегрирование прекращается, когда
+    скорость и ток ходовой за steady_state_window секунд изменились не больше допуска
+    (сравниваются два последних шага, так что колебания с периодом 2 шага тоже
+    считаются установившимися); нагрев до max_time досчитывается аналитически.
+    integrator - "euler" (по умолчанию), "rk4", "rk23" или "analytic" (см. INTEGRATORS);
+    dt - шаг для rk4 / начальный шаг для rk23 / шаг сетки analytic, rtol - допуск rk23.
     """
+    if integrator == "analytic":
+        result, time_to_20 = _simulate_analytic(params, total_mass_kg, max_time, dt)
+        if not stats_only:
+            return result.row(0)
+        stats = _aggregate_batch(result, time_to_20)
+        return {key: (val[0] if key == "wire_awg" else float(val[0])) for key, val in stats.items()}
+    if integrator != "euler":
+        result = _simulate_rk_single(params, total_mass_kg, max_time, integrator, dt, rtol)
+        return aggregate_sim_stats(result) if stats_only else result
+    if _backend == "numba":
+        result = _simulate_euler_jit(
+            params, total_mass_kg, max_time, stats_only, steady_state_tol, steady_state_window,
+            single=True
+        )
+        if not stats_only:
+            return result
+        stats = {key: float(val) for key, val in result.items()}
+        stats["wire_awg"] = wire_gauge(stats["peak_current"])
+        return stats
+    
     dt = 0.05  # шаг времени, с
     t_values = np.arange(0, max_time, dt)
     
+    if stats_only:
+        # Бегущие агрегаты вместо траектории
+        peak_current = -np.inf
+        min_voltage = np.inf
+        temp_drive_max = -np.inf
+        temp_weap_max = -np.inf
+        max_speed = -np.inf
+        time_to_20 = max_time  # не достиг
+        reached_20 = False
+        # Детектор установившегося режима: раз в окно сравниваем два последних шага
+        # со снимком, сделанным окном ранее (окно - четное число шагов)
+        window_steps = 2 * max(1, int(round(steady_state_window / dt / 2)))
+        snapshot = None
+        v_prev = i_drive_prev = 0.0
+    else:
+        # Колонки результата (размер известен заранее)
+        steps = len(t_values)
+        col_v = np.empty(steps)
+        col_dist = np.empty(steps)
+        col_i_bat = np.empty(steps)
+        col_u_bat = np.empty(steps)
+        col_t_drive = np.empty(steps)
+        col_t_weap = np.empty(steps)
+    
+    steps_iter = _euler_steps(params, total_mass_kg, t_values, dt)
+    for k, (t, v, dist, i_drive_limited, i_bat_total, u_actual, temp_drive, temp_weap) in enumerate(steps_iter):
+        if stats_only:
+            v_kmh = v * 3.6
+            peak_current = max(peak_current, i_bat_total)
+            min_voltage = min(min_voltage, u_actual)
+            temp_drive_max = max(temp_drive_max, temp_drive)
+            temp_weap_max = max(temp_weap_max, temp_weap)
+            max_speed = max(max_speed, v_kmh)
+            if not reached_20 and v_kmh >= ACCEL_TARGET_KMH:
+                time_to_20 = float(t)
+                reached_20 = True
+            
+            if steady_state_tol is not None and (k + 1) % window_steps == 0:
+                current = (v_prev, v, i_drive_prev, i_drive_limited)
+                steady = snapshot is not None and all(
+                    _is_steady(value, anchor, steady_state_tol)
+                    for value, anchor in zip(current, snapshot)
+                )
+                snapshot = current
+                
+                if steady:
+                    # Режим установился: скорость и токи дальше не растут,
+                    # нагрев досчитываем в замкнутом виде
+                    weap_count = params["weapon_motor_count"] or 1
+                    drive_tail, weap_tail = _steady_tail_temps(
+                        temp_drive, temp_weap, i_drive_prev, i_drive_limited, params["simulate_weapon"],
+                        params["esc_current_limit_weapon"] * params["weapon_motor_count"] / weap_count,
+                        10.0 / weap_count, params.get("weapon_spinup_s", WEAPON_SPINUP_S), t_values[k + 1:], dt
+                    )
+                    temp_drive_max = max(temp_drive_max, float(drive_tail))
+                    temp_weap_max = max(temp_weap_max, float(weap_tail))
+                    break
+            v_prev, i_drive_prev = v, i_drive_limited
+        else:
+            col_v[k] = v * 3.6
+            col_dist[k] = dist
+            col_i_bat[k] = i_bat_total
+            col_u_bat[k] = u_actual
+            col_t_drive[k] = temp_drive
+            col_t_weap[k] = temp_weap
+    
+    if stats_only:
+        return {
+            "peak_current": peak_current,
+            "min_voltage": min_voltage,
+            "temp_drive_max": temp_drive_max,
+            "temp_weap_max": temp_weap_max,
+            "wire_awg": wire_gauge(peak_current),
+            "max_speed": max_speed,
+            "time_to_20": time_to_20,
+        }
+        
+    return SimulationResult({
+        "t": t_values,
+        "v_kmh": col_v,
+        "dist": col_dist,
+        "I_bat": col_i_bat,
+        "U_bat": col_u_bat,
+        "T_drive": col_t_drive,
+        "T_weapon": col_t_weap,
+    }, max_time)
+
+
+def simulate_full_system_stream(
+    params: Dict,
+    total_mass_kg: float,
+    max_time: float = 8.0,
+    chunk_steps: int = STREAM_CHUNK_STEPS
+):
+    """
+    Генератор-вариант simulate_full_system (схема Эйлера, та же физика):
+    выдает SimulationResult-чанки по chunk_steps шагов по мере расчета,
+    чтобы графики дорисовывались, не дожидаясь конца симуляции.
+    Склеенные чанки совпадают с simulate_full_system.
+    """
+    dt = 0.05  # шаг времени, с
+    t_values = np.arange(0, max_time, dt)
+    keys = ("t", "v_kmh", "dist", "I_bat", "U_bat", "T_drive", "T_weapon")
+    
+    rows = []
+    for t, v, dist, _, i_bat_total, u_actual, temp_drive, temp_weap in _euler_steps(
+        params, total_mass_kg, t_values, dt
+    ):
+        rows.append((t, v * 3.6, dist, i_bat_total, u_actual, temp_drive, temp_weap))
+        if len(rows) == chunk_steps:
+            yield SimulationResult(dict(zip(keys, map(np.array, zip(*rows)))), max_time)
+            rows = []
+    if rows:
+        yield SimulationResult(dict(zip(keys, map(np.array, zip(*rows)))), max_time)
+
+
+def _euler_steps(params: Dict, total_mass_kg: float, t_values: np.ndarray, dt: float):
+    """
+    Шаги схемы Эйлера одной конфигурации (общий цикл simulate_full_system и
+    simulate_full_system_stream). Для каждого t выдает состояние после шага:
+    (t, v, dist, i_drive_limited, i_bat_total, u_actual, temp_drive, temp_weap).
+    """
     # Состояние
     v = 0.0  # скорость, м/с
     dist = 0.0 # дистанция
@@ -98,7 +542,8 @@ def simulate_full_system(params: Dict, total_mass_kg: float, max_time: float = 8
     limit_drive = params["esc_current_limit_drive"]
     mu = params["friction_coeff"]
     
-    results = []
+    # Оружие
+    weap_spinup = params.get("weapon_spinup_s", WEAPON_SPINUP_S)
     
     for t in t_values:
         # --- Ходовая ---
@@ -155,8 +600,8 @@ def simulate_full_system(params: Dict, total_mass_kg: float, max_time: float = 8
         if params["simulate_weapon"]:
             # Аналогично ходовой, раскрутка инерционной массы
             # Тут просто профиль тока: макс ток пока не раскрутится
-            # Предположим раскрутку за 3 сек
-            if t < 3.0:
+            # (время раскрутки - weapon_spinup_s, по умолчанию WEAPON_SPINUP_S = 3 сек)
+            if t < weap_spinup:
                 i_weap_total = params["esc_current_limit_weapon"] * params["weapon_motor_count"]
             else:
                 i_weap_total = 10.0 # поддержание
@@ -185,52 +630,731 @@ def simulate_full_system(params: Dict, total_mass_kg: float, max_time: float = 8
             power_heat_weap = (i_weap_single**2) * R_phase_drive
             temp_weap += ((power_heat_weap * dt) / heat_cap) - ((temp_weap - 25.0) * 0.05 * dt)
         
-        results.append({
-            "t": t,
-            "v_kmh": v * 3.6,
-            "dist": dist,
-            "I_bat": i_bat_total,
-            "U_bat": u_actual,
-            "T_drive": temp_drive,
-            "T_weapon": temp_weap
-        })
+        yield t, v, dist, i_drive_limited, i_bat_total, u_actual, temp_drive, temp_weap
+
+
+def _batch_constants(params: Dict, total_mass_kg) -> Dict[str, np.ndarray]:
+    """
+    Постоянные по времени величины батча (массивы длины N).
+    Скалярные значения params размножаются на весь батч.
+    """
+    mass = np.atleast_1d(np.asarray(total_mass_kg, dtype=float))
+    n = max([mass.size] + [np.size(val) for val in params.values() if not isinstance(val, (int, float))])
+
+    def col(key, dtype=float):
+        val = np.asarray(params[key], dtype=dtype)
+        return np.full(n, val) if val.ndim == 0 else np.broadcast_to(val, (n,)).copy()
+
+    mass = np.broadcast_to(mass, (n,)).copy()
+
+    # Ходовая
+    kv_drive = col("motor_kv")
+    with np.errstate(divide="ignore"):
+        kt_drive = np.where(kv_drive > 0, 9.55 / kv_drive, 0.0)
+    mu = col("friction_coeff")
+
+    # Оружие
+    weap_count = col("weapon_motor_count")
+
+    return {
+        "mass": mass,
+        "U": col("voltage_nom"),
+        "R_bat": col("battery_ir_mohm") / 1000.0, # Ом
+        "kv_drive": kv_drive,
+        "kt_drive": kt_drive,
+        "gear_drive": col("gear_ratio"),
+        "r_wheel": (col("wheel_dia_mm") / 1000.0) / 2.0,
+        "n_motors_drive": col("drive_motor_count"),
+        "limit_drive": col("esc_current_limit_drive"),
+        "sim_weapon": col("simulate_weapon", dtype=bool),
+        "weap_limit_total": col("esc_current_limit_weapon") * weap_count,
+        "weap_count_safe": np.where(weap_count > 0, weap_count, 1.0),
+        # Время раскрутки оружия (без weapon_spinup_s - прежнее допущение)
+        "weap_spinup": col("weapon_spinup_s") if "weapon_spinup_s" in params else np.full(n, WEAPON_SPINUP_S),
+        # Не зависящие от скорости силы
+        "force_friction_limit": mu * mass * G,
+        "force_rolling": 0.02 * mass * G,
+    }
+
+
+def _single_constants(params: Dict, total_mass_kg: float) -> Dict[str, float]:
+    """_batch_constants одной конфигурации на float (без массивов длины 1)."""
+    mass = float(total_mass_kg)
+    kv_drive = float(params["motor_kv"])
+    mu = float(params["friction_coeff"])
+    weap_count = float(params["weapon_motor_count"])
+    return {
+        "mass": mass,
+        "U": float(params["voltage_nom"]),
+        "R_bat": float(params["battery_ir_mohm"]) / 1000.0, # Ом
+        "kv_drive": kv_drive,
+        "kt_drive": 9.55 / kv_drive if kv_drive > 0 else 0.0,
+        "gear_drive": float(params["gear_ratio"]),
+        "r_wheel": (float(params["wheel_dia_mm"]) / 1000.0) / 2.0,
+        "n_motors_drive": float(params["drive_motor_count"]),
+        "limit_drive": float(params["esc_current_limit_drive"]),
+        "sim_weapon": bool(params["simulate_weapon"]),
+        "weap_limit_total": float(params["esc_current_limit_weapon"]) * weap_count,
+        "weap_count_safe": weap_count if weap_count > 0 else 1.0,
+        "weap_spinup": float(params.get("weapon_spinup_s", WEAPON_SPINUP_S)),
+        "force_friction_limit": mu * mass * G,
+        "force_rolling": 0.02 * mass * G,
+    }
+
+
+def traction_current(params: Dict, total_mass_kg) -> np.ndarray:
+    """
+    Ток батареи всех моторов хода на пределе сцепления (без лимита ESC), А:
+    выше него колеса буксуют (параметры - как у simulate_full_system_batch, массивы допустимы).
+    """
+    kv_drive = np.asarray(params["motor_kv"], dtype=float)
+    with np.errstate(divide="ignore"):
+        kt_drive = np.where(kv_drive > 0, 9.55 / kv_drive, 0.0)
+    force_friction_limit = np.asarray(params["friction_coeff"]) * np.asarray(total_mass_kg) * G
+    r_wheel = (np.asarray(params["wheel_dia_mm"]) / 1000.0) / 2.0
+    with np.errstate(divide="ignore"):
+        return force_friction_limit * r_wheel / (kt_drive * np.asarray(params["gear_ratio"]) * 0.8)
+
+
+def simulate_full_system_batch(
+    params: Dict,
+    total_mass_kg,
+    max_time: float = 8.0,
+    stats_only: bool = False,
+    steady_state_tol: float = None,
+    steady_state_window: float = STEADY_STATE_WINDOW,
+    integrator: str = "euler",
+    dt: float = None,
+    rtol: float = RK_RTOL
+):
+    """
+    Батчевая симуляция разгона: N конфигураций шагаются одновременно.
+
+    params - dict, где каждое значение либо скаляр (общий для всех), либо массив длины N.
+    Физика и порядок операций повторяют simulate_full_system, поэтому результаты
+    совпадают со скалярным путем. Колонки результата имеют форму (N, T).
+    stats_only=True - вместо траекторий возвращается dict метрик (массивы длины N).
+    steady_state_tol - как в simulate_full_system; установившиеся конфигурации
+    досчитываются аналитически, а выбывают из батча, когда их набралось не меньше
+    STEADY_COMPACT_FRACTION (или все) - остальные шагаются дальше.
+    integrator, dt, rtol - как в simulate_full_system (для rk23 шаг общий на весь батч).
+    """
+    if integrator == "analytic":
+        result, time_to_20 = _simulate_analytic(params, total_mass_kg, max_time, dt)
+        return _aggregate_batch(result, time_to_20) if stats_only else result
+    if integrator != "euler":
+        result = _simulate_rk(params, total_mass_kg, max_time, integrator, dt, rtol)
+        return _aggregate_batch(result) if stats_only else result
+    if _backend == "numba":
+        result = _simulate_euler_jit(
+            params, total_mass_kg, max_time, stats_only, steady_state_tol, steady_state_window
+        )
+        if stats_only:
+            result["wire_awg"] = wire_gauge(result["peak_current"])
+        return result
+    
+    dt = 0.05  # шаг времени, с
+    t_values = np.arange(0, max_time, dt)
+
+    c = _batch_constants(params, total_mass_kg)
+    n = len(c["mass"])
+    mass, U, R_bat = c["mass"], c["U"], c["R_bat"]
+    kv_drive, kt_drive, gear_drive, r_wheel = c["kv_drive"], c["kt_drive"], c["gear_drive"], c["r_wheel"]
+    n_motors_drive, limit_drive = c["n_motors_drive"], c["limit_drive"]
+    sim_weapon, weap_limit_total, weap_count_safe = c["sim_weapon"], c["weap_limit_total"], c["weap_count_safe"]
+    weap_spinup = c["weap_spinup"]
+    force_friction_limit, force_rolling = c["force_friction_limit"], c["force_rolling"]
+    R_phase_drive = 0.05
+    heat_cap = 500.0
+
+    # Состояние
+    v = np.zeros(n)
+    dist = np.zeros(n)
+    temp_drive = np.full(n, 25.0)
+    temp_weap = np.full(n, 25.0)
+
+    if stats_only:
+        stats = {
+            "peak_current": np.full(n, -np.inf),
+            "min_voltage": np.full(n, np.inf),
+            "temp_drive_max": np.full(n, -np.inf),
+            "temp_weap_max": np.full(n, -np.inf),
+            "max_speed": np.full(n, -np.inf),
+            "time_to_20": np.full(n, float(max_time)),  # не достиг
+        }
+        reached_20 = np.zeros(n, dtype=bool)
+        # Детектор установившегося режима (как в simulate_full_system, по каждой строке)
+        window_steps = 2 * max(1, int(round(steady_state_window / dt / 2)))
+        snapshot = None
+        v_prev = i_drive_prev = np.zeros(n)
+        # Итоговые метрики по исходным индексам; rows - индексы еще шагаемых строк,
+        # frozen - строки, метрики которых уже досчитаны (ждут удаления из батча)
+        final = {key: np.empty(n) for key in stats}
+        rows = np.arange(n)
+        frozen = np.zeros(n, dtype=bool)
+    else:
+        steps = len(t_values)
+        out = {
+            key: np.empty((n, steps))
+            for key in ("v_kmh", "dist", "I_bat", "U_bat", "T_drive", "T_weapon")
+        }
+
+    for k, t in enumerate(t_values):
+        # --- Ходовая ---
+        w_wheel = v / r_wheel
+        w_motor = w_wheel * gear_drive
+        rpm_motor = w_motor * 60 / (2*np.pi)
+        back_emf = rpm_motor / kv_drive
+
+        i_drive_raw = np.where(U > back_emf, (U - back_emf) / R_phase_drive, 0.0)
+        i_drive_limited = np.minimum(i_drive_raw, limit_drive)
+        i_drive_total = i_drive_limited * n_motors_drive
+
+        torque_motor = i_drive_limited * kt_drive
+        torque_wheel = torque_motor * gear_drive * 0.8
+        force_propulsion = (torque_wheel * n_motors_drive) / r_wheel
+        force_real = np.minimum(force_propulsion, force_friction_limit)
+
+        force_drag = 0.5 * 1.2 * 0.5 * (v**2) + force_rolling
+
+        accel = (force_real - force_drag) / mass
+        accel = np.where((accel < 0) & (v < 0.1), 0.0, accel) # Стоим
+
+        v = v + accel * dt
+        dist = dist + v * dt
+
+        # --- Оружие ---
+        i_weap_active = np.where(t < weap_spinup, weap_limit_total, 10.0)
+        i_weap_total = np.where(sim_weapon, i_weap_active, 0.0)
+
+        # --- Батарея и Тепло ---
+        i_bat_total = i_drive_total + i_weap_total
+        u_actual = U - i_bat_total * R_bat
+
+        power_heat_drive = (i_drive_limited**2) * R_phase_drive
+        d_temp_drive = (power_heat_drive * dt) / heat_cap
+        d_temp_drive -= (temp_drive - 25.0) * 0.05 * dt
+        temp_drive = temp_drive + d_temp_drive
+
+        i_weap_single = i_weap_total / weap_count_safe
+        power_heat_weap = (i_weap_single**2) * R_phase_drive
+        temp_weap = np.where(
+            sim_weapon,
+            temp_weap + (((power_heat_weap * dt) / heat_cap) - ((temp_weap - 25.0) * 0.05 * dt)),
+            temp_weap
+        )
+
+        if stats_only:
+            v_kmh = v * 3.6
+            np.maximum(stats["peak_current"], i_bat_total, out=stats["peak_current"])
+            np.minimum(stats["min_voltage"], u_actual, out=stats["min_voltage"])
+            np.maximum(stats["temp_drive_max"], temp_drive, out=stats["temp_drive_max"])
+            np.maximum(stats["temp_weap_max"], temp_weap, out=stats["temp_weap_max"])
+            np.maximum(stats["max_speed"], v_kmh, out=stats["max_speed"])
+            just_reached = (v_kmh >= ACCEL_TARGET_KMH) & ~reached_20
+            stats["time_to_20"][just_reached] = t
+            reached_20 |= just_reached
+            
+            if steady_state_tol is not None and (k + 1) % window_steps == 0:
+                current = (v_prev, v, i_drive_prev, i_drive_limited)
+                settled = np.zeros(len(v), dtype=bool)
+                if snapshot is not None:
+                    settled = np.logical_and.reduce([
+                        _is_steady(value, anchor, steady_state_tol)
+                        for value, anchor in zip(current, snapshot)
+                    ]) & ~frozen
+                snapshot = current
+                
+                if settled.any():
+                    # Установившиеся строки: нагрев досчитываем аналитически и фиксируем метрики
+                    drive_tail, weap_tail = _steady_tail_temps(
+                        temp_drive[settled], temp_weap[settled],
+                        i_drive_prev[settled], i_drive_limited[settled], sim_weapon[settled],
+                        weap_limit_total[settled] / weap_count_safe[settled],
+                        10.0 / weap_count_safe[settled], weap_spinup[settled], t_values[k + 1:], dt
+                    )
+                    np.maximum(stats["temp_drive_max"][settled], drive_tail, out=drive_tail)
+                    np.maximum(stats["temp_weap_max"][settled], weap_tail, out=weap_tail)
+                    stats["temp_drive_max"][settled] = drive_tail
+                    stats["temp_weap_max"][settled] = weap_tail
+                    for key in final:
+                        final[key][rows[settled]] = stats[key][settled]
+                    frozen |= settled
+                
+                # Сжатие батча дорого: только когда досчитана заметная доля строк
+                if frozen.all() or (frozen.any() and frozen.mean() >= STEADY_COMPACT_FRACTION):
+                    keep = ~frozen
+                    rows = rows[keep]
+                    frozen = frozen[keep]
+                    stats = {key: val[keep] for key, val in stats.items()}
+                    if not rows.size:
+                        break
+                    (
+                        mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel,
+                        n_motors_drive, limit_drive, sim_weapon, weap_limit_total,
+                        weap_count_safe, weap_spinup, force_friction_limit, force_rolling,
+                        v, dist, temp_drive, temp_weap, reached_20, i_drive_limited,
+                    ) = (
+                        arr[keep] for arr in (
+                            mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel,
+                            n_motors_drive, limit_drive, sim_weapon, weap_limit_total,
+                            weap_count_safe, weap_spinup, force_friction_limit, force_rolling,
+                            v, dist, temp_drive, temp_weap, reached_20, i_drive_limited,
+                        )
+                    )
+                    snapshot = tuple(arr[keep] for arr in snapshot)
+            v_prev, i_drive_prev = v, i_drive_limited
+        else:
+            out["v_kmh"][:, k] = v * 3.6
+            out["dist"][:, k] = dist
+            out["I_bat"][:, k] = i_bat_total
+            out["U_bat"][:, k] = u_actual
+            out["T_drive"][:, k] = temp_drive
+            out["T_weapon"][:, k] = temp_weap
+
+    if stats_only:
+        for key in final:
+            final[key][rows[~frozen]] = stats[key][~frozen]
+        final["wire_awg"] = wire_gauge(final["peak_current"])
+        return final
+
+    out["t"] = t_values
+    return SimulationResult(out, max_time)
+
+
+def _simulate_euler_jit(
+    params: Dict,
+    total_mass_kg,
+    max_time: float,
+    stats_only: bool,
+    steady_state_tol: float = None,
+    steady_state_window: float = STEADY_STATE_WINDOW,
+    settle_step: np.ndarray = None,
+    single: bool = False
+):
+    """
+    Схема Эйлера на скомпилированном ядре physics_jit (бэкенд "numba").
+    Возвращает SimulationResult батча или dict метрик SIM_STAT_KEYS (без wire_awg).
+    steady_state_tol (только для stats_only) - установившиеся строки ядро больше
+    не шагает, их нагрев до max_time досчитывается аналитически (как в Python-пути,
+    с точностью до округления степеней). settle_step - массив длины N для шагов
+    останова строк (-1 - шагалась до конца), нужен бенчмаркам.
+    Батч от JIT_PARALLEL_MIN_ROWS строк идет на потоках numba (euler_batch_parallel).
+    single=True - params скалярные (одна конфигурация, путь simulate_full_system):
+    SimulationResult с колонками (T,), метрики - скаляры.
+    """
+    dt = 0.05  # шаг времени, с
+    window_steps = 2 * max(1, int(round(steady_state_window / dt / 2)))
+    steady_tol = -1.0 if steady_state_tol is None else float(steady_state_tol)
+    if single:
+        # Одна конфигурация: константы и буферы строит само ядро
+        t_values, out, stats, settle = physics_jit.euler_single(
+            float(total_mass_kg), float(params["voltage_nom"]), float(params["battery_ir_mohm"]),
+            float(params["drive_motor_count"]), float(params["motor_kv"]), float(params["gear_ratio"]),
+            float(params["wheel_dia_mm"]), float(params["friction_coeff"]),
+            float(params["esc_current_limit_drive"]), bool(params["simulate_weapon"]),
+            float(params["weapon_motor_count"]), float(params["esc_current_limit_weapon"]),
+            float(params.get("weapon_spinup_s", WEAPON_SPINUP_S)), G,
+            float(max_time), ACCEL_TARGET_KMH, not stats_only, steady_tol, window_steps
+        )
+        if settle_step is not None:
+            settle_step[0] = settle
+        if stats_only:
+            return dict(zip(SIM_STAT_KEYS, stats))
+        return SimulationResult({
+            "t": t_values,
+            **dict(zip(("v_kmh", "dist", "I_bat", "U_bat", "T_drive", "T_weapon"), out)),
+        }, max_time)
+    
+    t_values = np.arange(0, max_time, dt)
+    c = _batch_constants(params, total_mass_kg)
+    n = len(c["mass"])
+    
+    out = np.empty((6, n, 0 if stats_only else len(t_values)))
+    stats = np.empty((len(SIM_STAT_KEYS), n))
+    if settle_step is None:
+        settle_step = np.empty(n, dtype=np.int64)
+    args = (
+        c["mass"], c["U"], c["R_bat"], c["kv_drive"], c["kt_drive"], c["gear_drive"], c["r_wheel"],
+        c["n_motors_drive"], c["limit_drive"], c["sim_weapon"], c["weap_limit_total"],
+        c["weap_count_safe"], c["weap_spinup"], c["force_friction_limit"], c["force_rolling"],
+        t_values, dt, float(max_time), ACCEL_TARGET_KMH, not stats_only, out, stats,
+        steady_tol, window_steps, settle_step
+    )
+    if n >= JIT_PARALLEL_MIN_ROWS and physics_jit.get_num_threads() > 1:
+        physics_jit.euler_batch_parallel(*args, JIT_PARALLEL_BLOCK)
+    else:
+        physics_jit.euler_batch(*args)
+    
+    if stats_only:
+        return dict(zip(SIM_STAT_KEYS, stats))
+    return SimulationResult({
+        "t": t_values,
+        **dict(zip(("v_kmh", "dist", "I_bat", "U_bat", "T_drive", "T_weapon"), out)),
+    }, max_time)
+
+
+def _rk_rates(weapon_spinning: bool, y: np.ndarray, c: Dict):
+    """
+    Правые части системы для методов Рунге-Кутты (та же физика, что в Эйлере).
+    y - состояние формы (4, N): скорость, дистанция, T_drive, T_weapon.
+    weapon_spinning - идет ли раскрутка оружия, по строкам (фиксируется на весь шаг,
+    т.к. шаги rk23 попадают на границы раскрутки). Возвращает производные формы (4, N) и токи в этой точке.
+    """
+    R_phase_drive = 0.05
+    heat_cap = 500.0
+    v, _, temp_drive, temp_weap = y
+    
+    w_motor = (v / c["r_wheel"]) * c["gear_drive"]
+    back_emf = w_motor * 60 / (2*np.pi) / c["kv_drive"]
+    i_drive_raw = np.where(c["U"] > back_emf, (c["U"] - back_emf) / R_phase_drive, 0.0)
+    i_drive_limited = np.minimum(i_drive_raw, c["limit_drive"])
+    
+    force_real = np.minimum(i_drive_limited * c["force_per_amp"], c["force_friction_limit"])
+    force_drag = 0.5 * 1.2 * 0.5 * (v**2) + c["force_rolling"]
+    accel = (force_real - force_drag) / c["mass"]
+    accel = np.where((accel < 0) & (v < 0.1), 0.0, accel) # Стоим
+    
+    i_weap_total = np.where(weapon_spinning, c["i_weap_spin"], c["i_weap_hold"])
+    
+    rates = np.empty_like(y)
+    rates[0] = accel
+    rates[1] = v
+    rates[2] = ((i_drive_limited**2) * R_phase_drive) / heat_cap - (temp_drive - 25.0) * 0.05
+    power_heat_weap = ((i_weap_total / c["weap_count_safe"])**2) * R_phase_drive
+    rates[3] = np.where(c["sim_weapon"], power_heat_weap / heat_cap - (temp_weap - 25.0) * 0.05, 0.0)
+    return rates, i_drive_limited, i_weap_total
+
+
+def _simulate_rk(
+    params: Dict,
+    total_mass_kg,
+    max_time: float,
+    integrator: str,
+    dt: float = None,
+    rtol: float = RK_RTOL
+) -> SimulationResult:
+    """
+    Интегрирование методом RK4 (фиксированный шаг) или адаптивным RK23
+    (Богацкий-Шампайн, контроль ошибки по скорости и температурам).
+    Строки результата - состояния в узлах сетки, начиная с t=0; для RK23 шаг переменный
+    и всегда попадает на границы профиля оружия (конец раскрутки) и max_time.
+    """
+    c = _batch_constants(params, total_mass_kg)
+    n = len(c["mass"])
+    # Производные величины, постоянные на всем интервале
+    c["force_per_amp"] = (c["kt_drive"] * c["gear_drive"] * 0.8 * c["n_motors_drive"]) / c["r_wheel"]
+    c["i_weap_spin"] = np.where(c["sim_weapon"], c["weap_limit_total"], 0.0)
+    c["i_weap_hold"] = np.where(c["sim_weapon"], 10.0, 0.0)
+    
+    y = np.zeros((4, n))
+    y[2:] = 25.0
+    
+    def rates(t_step_start, state):
+        return _rk_rates(t_step_start < c["weap_spinup"], state, c)
+    
+    times, states, currents = [], [], []
+    
+    def record(t, state, i_drive, i_weap):
+        times.append(t)
+        states.append(state)
+        currents.append(i_drive * c["n_motors_drive"] + i_weap)
+    
+    t = 0.0
+    k1, i_drive, i_weap = rates(t, y)
+    record(t, y, i_drive, i_weap)
+    
+    if integrator == "rk4":
+        h = dt if dt is not None else RK4_DT
+        steps = int(round(max_time / h))
+        for step in range(1, steps + 1):
+            k2, _, _ = rates(t, y + (h / 2) * k1)
+            k3, _, _ = rates(t, y + (h / 2) * k2)
+            k4, _, _ = rates(t, y + h * k3)
+            y = y + (h / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
+            t = step * h
+            k1, i_drive, i_weap = rates(t, y)  # k1 следующего шага
+            record(t, y, i_drive, i_weap)
+    elif integrator == "rk23":
+        h = dt if dt is not None else RK4_DT
+        spin_ends = np.unique(c["weap_spinup"][c["weap_spinup"] < max_time])
+        breakpoints = [float(b) for b in spin_ends if b > 0] + [max_time]
+        atol = 1e-3  # м/с и °C
+        controlled = [0, 2, 3]  # дистанция в контроль ошибки не входит
+        while t < max_time - 1e-12:
+            next_break = next(b for b in breakpoints if b > t + 1e-12)
+            h = min(h, RK23_MAX_DT, next_break - t)
+            k2, _, _ = rates(t, y + (h / 2) * k1)
+            k3, _, _ = rates(t, y + (3 * h / 4) * k2)
+            y_new = y + h * ((2 / 9) * k1 + (1 / 3) * k2 + (4 / 9) * k3)
+            k4, i_drive_new, i_weap_new = rates(t, y_new)
+            # Оценка ошибки: разность с вложенным методом 2-го порядка
+            err = h * ((-5 / 72) * k1 + (1 / 12) * k2 + (1 / 9) * k3 + (-1 / 8) * k4)
+            err_norm = np.max(np.abs(err[controlled]) / (atol + rtol * np.abs(y_new[controlled])))
+            if err_norm <= 1.0:
+                t_new = next_break if next_break - (t + h) < 1e-9 else t + h
+                if np.array_equal(t_new < c["weap_spinup"], t < c["weap_spinup"]):
+                    k1, i_drive, i_weap = k4, i_drive_new, i_weap_new  # FSAL
+                else:
+                    k1, i_drive, i_weap = rates(t_new, y_new)  # сменился профиль оружия
+                t, y = t_new, y_new
+                record(t, y, i_drive, i_weap)
+            factor = 5.0 if err_norm == 0 else min(5.0, max(0.2, 0.9 * err_norm ** (-1 / 3)))
+            h *= factor
+    else:
+        raise ValueError(f"Неизвестный интегратор: {integrator}")
+    
+    states = np.stack(states, axis=-1)  # (4, N, T)
+    i_bat = np.stack(currents, axis=-1)
+    return SimulationResult({
+        "t": np.array(times),
+        "v_kmh": states[0] * 3.6,
+        "dist": states[1],
+        "I_bat": i_bat,
+        "U_bat": c["U"][:, None] - i_bat * c["R_bat"][:, None],
+        "T_drive": states[2],
+        "T_weapon": states[3],
+    }, max_time)
+
+
+def _simulate_rk_single(
+    params: Dict,
+    total_mass_kg: float,
+    max_time: float,
+    integrator: str,
+    dt: float = None,
+    rtol: float = RK_RTOL
+) -> SimulationResult:
+    """
+    _simulate_rk для одной конфигурации на скалярном ядре physics_jit.rk_single
+    (скомпилированном на бэкенде "numba", иначе - обычный Python на float):
+    батчевые массивы (4, 1) и константы длины 1 дороже самих шагов.
+    """
+    if integrator not in ("rk4", "rk23"):
+        raise ValueError(f"Неизвестный интегратор: {integrator}")
+    c = _single_constants(params, total_mass_kg)
+    kernel = physics_jit.rk_single
+    if _backend != "numba":
+        kernel = getattr(kernel, "py_func", kernel)
+    times, out = kernel(
+        integrator == "rk23", c["mass"], c["U"], c["kv_drive"], c["gear_drive"], c["r_wheel"],
+        c["limit_drive"], (c["kt_drive"] * c["gear_drive"] * 0.8 * c["n_motors_drive"]) / c["r_wheel"],
+        c["force_friction_limit"], c["force_rolling"], c["sim_weapon"],
+        c["weap_limit_total"] if c["sim_weapon"] else 0.0, 10.0 if c["sim_weapon"] else 0.0,
+        c["weap_count_safe"], c["weap_spinup"], float(max_time),
+        dt if dt is not None else RK4_DT, rtol, RK23_MAX_DT
+    )
+    i_bat = out[4] * c["n_motors_drive"] + out[5]
+    return SimulationResult({
+        "t": times,
+        "v_kmh": out[0] * 3.6,
+        "dist": out[1],
+        "I_bat": i_bat,
+        "U_bat": c["U"] - i_bat * c["R_bat"],
+        "T_drive": out[2],
+        "T_weapon": out[3],
+    }, max_time)
+
+
+def _simulate_analytic(params: Dict, total_mass_kg, max_time: float, dt: float = None):
+    """
+    Кусочно-аналитическое решение непрерывной модели разгона (без шагов по времени).
+
+    Сила тяги монотонно падает с ростом скорости, поэтому режимы идут по порядку:
+    1. Ток упирается в лимит ESC и/или тяга в сцепление (mu*m*g) - сила постоянна,
+       m*v' = F0 - F_roll - k*v^2 дает v = v_t * tanh(t / tau).
+    2. Ограничение противо-ЭДС: сила линейна по скорости, m*v' = A - B*v - k*v^2 -
+       уравнение Риккати с постоянными коэффициентами, решается через его корни.
+    Если F0 не превышает сопротивление качению - робот стоит на месте.
+    Численно (квадратурой на сетке) считается только нагрев ходовой в режиме 2,
+    где ток нелинейно зависит от времени; нагрев оружия - экспонента по участкам.
+    Возвращает (SimulationResult на сетке 0..max_time, точное время до 20 км/ч).
+    """
+    c = _batch_constants(params, total_mass_kg)
+    R_phase = 0.05
+    heat_cap = 500.0
+    k_drag = 0.5 * 1.2 * 0.5
+    
+    h = dt if dt is not None else ANALYTIC_DT
+    t = np.linspace(0.0, max_time, int(round(max_time / h)) + 1)
+    
+    mass = c["mass"][:, None]
+    U = c["U"][:, None]
+    limit = c["limit_drive"][:, None]
+    f_roll = c["force_rolling"][:, None]
+    f_fric = c["force_friction_limit"][:, None]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Противо-ЭДС на единицу скорости, В/(м/с), и сила тяги на ампер, Н/А
+        emf_per_speed = np.where(
+            c["kv_drive"] > 0,
+            c["gear_drive"] * 60 / (2*np.pi) / (c["r_wheel"] * c["kv_drive"]), 0.0
+        )[:, None]
+        force_per_amp = ((c["kt_drive"] * c["gear_drive"] * 0.8 * c["n_motors_drive"]) / c["r_wheel"])[:, None]
+        
+        # Режим 1: сила F0 постоянна до скорости v_a (ESC и/или сцепление)
+        i_start = np.minimum(U / R_phase, limit)
+        f_start = np.minimum(i_start * force_per_amp, f_fric)
+        net_start = f_start - f_roll
+        stall = net_start <= 0
+        
+        v_esc = np.maximum((U - limit * R_phase) / emf_per_speed, 0.0)
+        v_trac = np.maximum((U - R_phase * f_fric / force_per_amp) / emf_per_speed, 0.0)
+        v_a = np.where(emf_per_speed > 0, np.maximum(v_esc, v_trac), np.inf)
+        
+        v_term = np.sqrt(np.maximum(net_start, 0.0) / k_drag)
+        tau = mass / (k_drag * v_term)
+        leaves_1 = v_a < v_term
+        t_a = np.where(leaves_1, tau * np.arctanh(np.minimum(v_a / v_term, 1.0)), np.inf)
+        
+        # Режим 2: m*v' = A - B*v - k*v^2, корни v1 > 0 > v2
+        coef_a = force_per_amp * U / R_phase - f_roll
+        coef_b = force_per_amp * emf_per_speed / R_phase
+        disc = np.sqrt(coef_b**2 + 4 * k_drag * np.maximum(coef_a, 0.0))
+        v1 = (-coef_b + disc) / (2 * k_drag)
+        v2 = (-coef_b - disc) / (2 * k_drag)
+        ratio_a = (v_a - v1) / (v_a - v2)
+        rate = k_drag * (v1 - v2) / mass
+        
+        times = t[None, :]
+        v_phase1 = v_term * np.tanh(times / tau)
+        z = ratio_a * np.exp(-rate * np.maximum(times - t_a, 0.0))
+        v_phase2 = (v1 - z * v2) / (1 - z)
+        v = np.where(stall, 0.0, np.where(times < t_a, v_phase1, v_phase2))
         
-    return pd.DataFrame(results)
+        # Время до 20 км/ч - обращением решения на своем участке
+        v20 = ACCEL_TARGET_KMH / 3.6
+        t20_phase1 = tau * np.arctanh(np.minimum(v20 / v_term, 1.0))
+        z20 = (v20 - v1) / (v20 - v2)
+        t20_phase2 = t_a + np.log(ratio_a / z20) / rate
+        t20 = np.where(v20 <= np.minimum(v_a, v_term), t20_phase1, t20_phase2)
+        reached = ~stall[:, 0] & (v[:, -1] >= v20)
+        time_to_20 = np.where(reached, t20[:, 0], float(max_time))
+    
+    # Токи по скорости
+    i_drive = np.minimum(np.maximum(U - emf_per_speed * v, 0.0) / R_phase, limit)
+    sim_weapon = c["sim_weapon"][:, None]
+    spin_end = c["weap_spinup"][:, None]
+    spinning = times < spin_end
+    i_weap = np.where(sim_weapon, np.where(spinning, c["weap_limit_total"][:, None], 10.0), 0.0)
+    i_bat = i_drive * c["n_motors_drive"][:, None] + i_weap
+    
+    # Нагрев ходовой: T' = P(t)/C - b*(T - 25), T(0) = 25 -> T = 25 + e^{-bt} * int e^{bs} P/C ds
+    b = 0.05
+    heat = np.exp(b * t)[None, :] * ((i_drive**2) * R_phase / heat_cap)
+    integral = np.concatenate(
+        [np.zeros((heat.shape[0], 1)), np.cumsum((heat[:, 1:] + heat[:, :-1]) * (np.diff(t) / 2), axis=1)],
+        axis=1
+    )
+    temp_drive = 25.0 + np.exp(-b * t)[None, :] * integral
+    
+    # Нагрев оружия: постоянная мощность на участках раскрутки и поддержания
+    count = c["weap_count_safe"][:, None]
+    eq_spin = 25.0 + ((c["weap_limit_total"][:, None] / count)**2) * R_phase / (heat_cap * b)
+    eq_hold = 25.0 + ((10.0 / count)**2) * R_phase / (heat_cap * b)
+    t_spin_end = np.minimum(spin_end, max_time)
+    temp_spin_end = eq_spin + (25.0 - eq_spin) * np.exp(-b * t_spin_end)
+    temp_weap = np.where(
+        spinning,
+        eq_spin + (25.0 - eq_spin) * np.exp(-b * times),
+        eq_hold + (temp_spin_end - eq_hold) * np.exp(-b * (times - spin_end))
+    )
+    temp_weap = np.where(sim_weapon, temp_weap, 25.0)
+    
+    dist = np.concatenate(
+        [np.zeros((v.shape[0], 1)), np.cumsum((v[:, 1:] + v[:, :-1]) * (np.diff(t) / 2), axis=1)],
+        axis=1
+    )
+    result = SimulationResult({
+        "t": t,
+        "v_kmh": v * 3.6,
+        "dist": dist,
+        "I_bat": i_bat,
+        "U_bat": U - i_bat * c["R_bat"][:, None],
+        "T_drive": temp_drive,
+        "T_weapon": temp_weap,
+    }, max_time)
+    return result, time_to_20
+
+
+def _aggregate_batch(result: SimulationResult, time_to_20=None) -> Dict:
+    """Метрики aggregate_sim_stats по батчу траекторий (массивы длины N)."""
+    peak_current = result["I_bat"].max(axis=-1)
+    if time_to_20 is None:
+        time_to_20 = time_to_speed(
+            result["t"], result["v_kmh"], ACCEL_TARGET_KMH, default=float(result.max_time)
+        )
+    return {
+        "peak_current": peak_current,
+        "min_voltage": result["U_bat"].min(axis=-1),
+        "temp_drive_max": result["T_drive"].max(axis=-1),
+        "temp_weap_max": result["T_weapon"].max(axis=-1),
+        "max_speed": result["v_kmh"].max(axis=-1),
+        "time_to_20": time_to_20,
+        "wire_awg": wire_gauge(peak_current),
+    }
+
+
+def time_to_speed(t_values: np.ndarray, v_kmh: np.ndarray, target_kmh: float, default: float) -> np.ndarray:
+    """
+    Время первого достижения скорости target_kmh для каждой строки батча (N, T).
+    Если скорость не достигнута, возвращается default.
+    """
+    reached = v_kmh >= target_kmh
+    first_idx = reached.argmax(axis=-1)
+    return np.where(reached.any(axis=-1), t_values[first_idx], default)
+
 
+def wire_gauge(peak_current):
+    """
+    Подбор сечения провода по пиковому току (скаляр или массив).
+    < 50A -> 12AWG, < 80A -> 10AWG, < 150A -> 8AWG, else 6AWG
+    """
+    if np.ndim(peak_current) == 0:
+        for limit, awg in WIRE_GAUGES:
+            if peak_current < limit:
+                return awg
+        return WIRE_GAUGE_MAX
+    peak_current = np.asarray(peak_current)
+    return np.select(
+        [peak_current < limit for limit, _ in WIRE_GAUGES],
+        [awg for _, awg in WIRE_GAUGES],
+        default=WIRE_GAUGE_MAX
+    )
 
-def aggregate_sim_stats(df: pd.DataFrame) -> Dict:
+
+def aggregate_sim_stats(df: SimulationResult) -> Dict:
     """
-    Считает итоговые метрики по симуляции.
+    Считает итоговые метрики по симуляции (SimulationResult или DataFrame).
     """
     peak_current = df["I_bat"].max()
     min_voltage = df["U_bat"].min()
     temp_drive_max = df["T_drive"].max()
     temp_weap_max = df["T_weapon"].max()
+    max_speed = df["v_kmh"].max()
     
-    # Подбор сечения провода по току (табличное)
-    # < 50A -> 12AWG, < 80A -> 10AWG, < 150A -> 8AWG, else 6AWG
-    if peak_current < 50: awg = "12 AWG"
-    elif peak_current < 80: awg = "10 AWG"
-    elif peak_current < 150: awg = "8 AWG"
-    else: awg = "6 AWG (или шина)"
+    # Время разгона; если не достиг - длительность симуляции
+    t_values = np.asarray(df["t"])
+    max_time = getattr(df, "max_time", None)
+    if max_time is None:
+        max_time = t_values[-1] + (t_values[1] - t_values[0]) if len(t_values) > 1 else 0.0
+    time_to_20 = time_to_speed(t_values, np.asarray(df["v_kmh"]), ACCEL_TARGET_KMH, default=max_time)
     
     return {
         "peak_current": peak_current,
         "min_voltage": min_voltage,
         "temp_drive_max": temp_drive_max,
         "temp_weap_max": temp_weap_max,
-        "wire_awg": awg
+        "wire_awg": wire_gauge(peak_current),
+        "max_speed": max_speed,
+        "time_to_20": float(time_to_20),
     }
 
 
-def analyze_collision(
-    robot_mass: float, 
-    weapon_inertia: float, 
-    weapon_rpm: float, 
-    target_mass: float = 110.0
-) -> Dict:
+def _collision_core(robot_mass, weapon_inertia, weapon_rpm, target_mass) -> Dict:
     """
-    Расчет параметров удара (абсолютно неупругое столкновение для оценки пиков).
+    Формулы удара (общие для analyze_collision и collision_matrix).
+    Аргументы - скаляры или массивы, совместимые по броадкастингу.
     """
     # Энергия ротора
     w = weapon_rpm * 2 * np.pi / 60
@@ -262,6 +1386,28 @@ def analyze_collision(
     # Скорость отскока
     v_recoil = impulse / robot_mass
     
+    return {
+        "energy_joules": energy,
+        "impulse": impulse,
+        "impact_force_kn": avg_force / 1000.0,
+        "g_force_self": g_force_self,
+        "g_force_target": g_force_target,
+        "recoil_speed_kmh": v_recoil * 3.6,
+    }
+
+
+def analyze_collision(
+    robot_mass: float, 
+    weapon_inertia: float, 
+    weapon_rpm: float, 
+    target_mass: float = 110.0
+) -> Dict:
+    """
+    Расчет параметров удара (абсолютно неупругое столкновение для оценки пиков).
+    """
+    core = _collision_core(robot_mass, weapon_inertia, weapon_rpm, target_mass)
+    energy = core["energy_joules"]
+    
     # Эквивалент (автомобиль 1.5т на скорости X)
     # E_car = 0.5 * 1500 * v^2 = energy
     # v = sqrt(2*E / 1500)
@@ -270,14 +1416,32 @@ def analyze_collision(
     
     return {
         "energy_joules": energy,
-        "impact_force_kn": avg_force / 1000.0,
-        "g_force_self": g_force_self,
-        "g_force_target": g_force_target,
-        "recoil_speed_kmh": v_recoil * 3.6,
+        "impact_force_kn": core["impact_force_kn"],
+        "g_force_self": core["g_force_self"],
+        "g_force_target": core["g_force_target"],
+        "recoil_speed_kmh": core["recoil_speed_kmh"],
         "equivalent": f"Авто (1.5т) на {v_car_kmh:.1f} км/ч"
     }
 
 
+def collision_matrix(robot_mass, weapon_inertia, weapon_rpm, target_masses) -> Dict[str, np.ndarray]:
+    """
+    Векторный analyze_collision: N конструкций (массивы или скаляры robot_mass,
+    weapon_inertia, weapon_rpm) против M соперников (target_masses) за один вызов.
+    energy_joules - массив (N,), импульс, сила, перегрузки и отскок - сетки (N, M).
+    """
+    robot_mass, weapon_inertia, weapon_rpm = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(val, dtype=float)) for val in (robot_mass, weapon_inertia, weapon_rpm))
+    )
+    target_masses = np.atleast_1d(np.asarray(target_masses, dtype=float))
+    core = _collision_core(
+        robot_mass[:, None], weapon_inertia[:, None], weapon_rpm[:, None], target_masses[None, :]
+    )
+    core["energy_joules"] = core["energy_joules"][:, 0]
+    core["target_mass"] = target_masses
+    return core
+
+
 def generate_report(params: Dict, static: Dict, sim: Dict, col: Dict) -> str:
     """
     Генерация Markdown отчета.
@@ -307,76 +1471,531 @@ def generate_report(params: Dict, static: Dict, sim: Dict, col: Dict) -> str:
 *Сгенерировано в Digital Twin 1T Rex*
 """
 
+def _mc_normals(sampler: str, seed_seq: np.random.SeedSequence, size: int, dims: int = 3) -> np.ndarray:
+    """Стандартные нормальные величины (size, dims) чанка по схеме выборки."""
+    rng = np.random.default_rng(seed_seq)
+    if sampler == "random":
+        # Блоками по 3: первые колонки совпадают с выборкой без оружия
+        return np.hstack([rng.standard_normal((size, 3)) for _ in range(dims // 3)])
+    if sampler == "sobol":
+        with warnings.catch_warnings():
+            # Неполный последний чанк теряет баланс степени двойки - допустимо
+            warnings.simplefilter("ignore", UserWarning)
+            u = qmc.Sobol(d=dims, scramble=True, seed=rng).random(size)
+    else:
+        u = qmc.LatinHypercube(d=dims, seed=rng).random(size)
+    # Обратная функция нормального распределения; края отсекаем от бесконечностей
+    return ndtri(np.clip(u, 1e-12, 1.0 - 1e-12))
+
+
+def _mc_sim_params(
+    base_inputs: Dict, static_res: Dict, sigma_scale: float, z: np.ndarray, include_weapon: bool
+) -> Tuple[Dict, Dict]:
+    """
+    Параметры батча симуляции для возмущений z (size, 3 или 6) вокруг одной конфигурации.
+    Возвращает (sim_params, варьированные параметры по колонкам).
+    """
+    # 1. KV моторов (производственный разброс)
+    sim_kv = base_inputs["motor_kv"] * (1.0 + sigma_scale * z[:, 0])
+    
+    # 2. Трение (сильно зависит от покрытия), варьируется сильнее
+    friction_factor = 1.0 + (sigma_scale * 1.5) * z[:, 1]
+    sim_friction = np.clip(base_inputs["friction_coeff"] * friction_factor, 0.1, 1.5)
+    
+    # 3. Сопротивление батареи (температура, заряд)
+    sim_ir = base_inputs["battery_ir_mohm"] * (1.0 + sigma_scale * z[:, 2])
+    
+    # Колоночный батч параметров: варьируемые - массивы, остальные - общие скаляры
+    sim_params = {
+        "voltage_nom": static_res["voltage_nom"], # Напряжение считаем номинальным, но IR "гуляет"
+        "battery_ir_mohm": sim_ir,
+        "drive_motor_count": base_inputs["drive_motor_count"],
+        "motor_kv": sim_kv,
+        "gear_ratio": base_inputs["gear_ratio"],
+        "wheel_dia_mm": base_inputs["wheel_dia_mm"],
+        "friction_coeff": sim_friction,
+        "esc_current_limit_drive": base_inputs["esc_current_limit_drive"],
+        "simulate_weapon": False, # Без include_weapon оружие отключено
+        "weapon_motor_count": 0,
+        "weapon_motor_kv": 0,
+        "weapon_reduction": 1,
+        "weapon_inertia": 0,
+        "esc_current_limit_weapon": 0,
+        "weapon_spinup_s": WEAPON_SPINUP_S,
+    }
+    columns = {"kv_used": sim_kv, "friction_used": sim_friction}
+    
+    if include_weapon:
+        # 4. KV моторов оружия, 5. калибровка лимита ESC, 6. инерция ротора (допуски массы/радиуса)
+        weap_kv = base_inputs["weapon_motor_kv"] * (1.0 + sigma_scale * z[:, 3])
+        weap_limit = base_inputs["esc_current_limit_weapon"] * (1.0 + sigma_scale * z[:, 4])
+        weap_inertia = static_res["weapon_inertia"] * (1.0 + sigma_scale * z[:, 5])
+        # Канал оружия шагается в том же батче; раскрутка - из физики ротора каждой итерации
+        spinup = weapon_spinup_time(
+            static_res["voltage_nom"], weap_kv, base_inputs["weapon_reduction"], weap_inertia,
+            base_inputs["weapon_motor_count"], weap_limit
+        )
+        sim_params.update({
+            "simulate_weapon": True,
+            "weapon_motor_count": base_inputs["weapon_motor_count"],
+            "weapon_motor_kv": weap_kv,
+            "weapon_reduction": base_inputs["weapon_reduction"],
+            "weapon_inertia": weap_inertia,
+            "esc_current_limit_weapon": weap_limit,
+            "weapon_spinup_s": spinup,
+        })
+        columns.update(
+            weapon_kv_used=weap_kv,
+            weapon_limit_used=weap_limit,
+            weapon_inertia_used=weap_inertia,
+            weapon_spinup_time=spinup,
+        )
+    return sim_params, columns
+
+
+def _monte_carlo_chunk(task: Tuple) -> List[Tuple[Dict, Dict]]:
+    """
+    Один чанк Монте-Карло (выполняется и в процессе пула, поэтому на уровне модуля).
+    task - (configs, sigma_scale, sampler, seed_seq, size), configs - кортеж
+    (base_inputs, static_res, include_weapon). Все конфигурации получают одни и те же
+    возмущения (общие случайные числа) и считаются одним батчем.
+    Возвращает по конфигурации (варьированные параметры по колонкам, метрики батча).
+    """
+    configs, sigma_scale, sampler, seed_seq, size = task
+    
+    # Стандартные нормальные величины: [kv, трение, IR] на каждую итерацию,
+    # с оружием еще [kv оружия, лимит ESC оружия, инерция ротора]
+    dims = 6 if any(include for _, _, include in configs) else 3
+    z = _mc_normals(sampler, seed_seq, size, dims)
+    
+    parts = [_mc_sim_params(base, static, sigma_scale, z, include) for base, static, include in configs]
+    if len(parts) == 1:
+        sim_params = parts[0][0]
+        total_mass = configs[0][1]["total_mass"]
+    else:
+        # Конфигурации подряд в одном батче: скаляры размножаются на свой блок строк
+        sim_params = {
+            key: np.concatenate([np.broadcast_to(params[key], (size,)) for params, _ in parts])
+            for key in parts[0][0]
+        }
+        total_mass = np.repeat([static["total_mass"] for _, static, _ in configs], size)
+    
+    # Итерации чанка - один батчевый прогон без траекторий (до 4 сек достаточно для разгона).
+    # Строки батча независимы, поэтому разбиение на чанки метрики не меняет.
+    sim_stats = simulate_full_system_batch(
+        sim_params, total_mass, max_time=4.0,
+        stats_only=True, steady_state_tol=batch_steady_state_tol()
+    )
+    return [
+        (columns, {key: val[j * size:(j + 1) * size] for key, val in sim_stats.items()})
+        for j, (_, columns) in enumerate(parts)
+    ]
+
+
+def _resolve_workers(workers: int) -> int:
+    """Число процессов: -1 (или None) - все ядра."""
+    if workers is None or workers < 0:
+        return os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+def _iter_chunks(tasks: List[Tuple], workers: int, wave: int):
+    """
+    Чанки Монте-Карло по порядку. На пуле задачи отправляются волнами по wave:
+    при досрочной остановке лишние волны не считаются.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _monte_carlo_chunk(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(tasks), wave):
+            yield from pool.map(_monte_carlo_chunk, tasks[start:start + wave])
+
+
+def monte_carlo_ci(
+    samples: Dict[str, RunningStats],
+    replicates: Dict[str, RunningStats],
+    sampler: str = "random",
+    level: float = MC_CI_LEVEL
+) -> Dict:
+    """
+    Полная ширина доверительного интервала среднего по MC_CI_KEYS
+    относительно среднего (0.01 = 1%). random - по бегущим статистикам всех
+    итераций samples (нормальное приближение), sobol/lhs - по средним
+    реплик-чанков replicates (Стьюдент); пока реплик меньше MC_MIN_REPLICATES,
+    ширина бесконечна.
+    """
+    widths = {}
+    for key in MC_CI_KEYS:
+        running = samples[key] if sampler == "random" else replicates[key]
+        half = _mc_ci_half(running, sampler, level)
+        mean = abs(running.mean)
+        widths[key] = float(2.0 * half / mean) if mean > 0 else float(2.0 * half)
+    return widths
+
+
+def _mc_ci_half(running: RunningStats, sampler: str, level: float = MC_CI_LEVEL) -> float:
+    """
+    Абсолютная полуширина ДИ среднего: running - статистики всех итераций (random,
+    нормальное приближение) либо средних реплик-чанков (sobol/lhs, Стьюдент).
+    """
+    if sampler == "random":
+        if running.n < 2:
+            return np.inf
+        quantile = ndtri(0.5 + level / 2)
+    else:
+        if running.n < MC_MIN_REPLICATES:
+            return np.inf
+        quantile = student_t.ppf(0.5 + level / 2, running.n - 1)
+    return float(quantile * running.std / np.sqrt(running.n))
+
+
+def _mc_chunk_size(iterations: int) -> int:
+    """Размер чанка Монте-Карло: ~MC_TARGET_CHUNKS чанков, степень двойки (баланс Соболя)."""
+    size = MC_MIN_CHUNK_SIZE
+    while size < MC_CHUNK_SIZE and size * MC_TARGET_CHUNKS < iterations:
+        size *= 2
+    return size
+
+
+def _mc_tasks(configs: Tuple, variation_pct: float, iterations: int, seed: int, sampler: str) -> List[Tuple]:
+    """
+    Задачи-чанки Монте-Карло для _monte_carlo_chunk (configs - см. там).
+    Разбиение зависит только от iterations, а не от числа процессов.
+    """
+    if sampler not in MC_SAMPLERS:
+        raise ValueError(f"Неизвестная схема выборки: {sampler}. Доступны: {', '.join(MC_SAMPLERS)}")
+    
+    # Генераторы случайных чисел (нормальное распределение)
+    # variation_pct считается как "3 сигма" (99.7% значений попадают в этот диапазон)
+    sigma_scale = variation_pct / 3.0
+    
+    chunk = _mc_chunk_size(iterations)
+    sizes = [min(chunk, iterations - start) for start in range(0, iterations, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(configs, sigma_scale, sampler, seq, size) for seq, size in zip(seeds, sizes)]
+
+
+def run_monte_carlo_stream(
+    base_inputs: Dict,
+    static_res: Dict,
+    variation_pct: float = 0.10,
+    iterations: int = 100,
+    seed: int = MC_SEED,
+    workers: int = 1,
+    sampler: str = "random",
+    ci_width: float = None,
+    include_weapon: bool = False,
+    quantiles: Tuple[float, ...] = DEFAULT_QUANTILES,
+    use_store: bool = True
+):
+    """
+    Потоковый Монте-Карло: генератор, отдающий по чанку (см. _mc_chunk_size).
+    Аргументы - как у run_monte_carlo_simulation, чанки и точка останова те же.
+    Средние, дисперсии и квантили (P²) по MC_STREAM_KEYS (с оружием и MC_WEAPON_KEYS)
+    ведутся бегущими статистиками (quantiles - оцениваемые квантили, () - без них),
+    гистограммы - счетчиками бинов; строки прошлых чанков не хранятся.
+    use_store - итог завершенного потока (статистики и гистограммы, без строк)
+    сохраняется в RESULT_STORE ("monte_carlo_stream") и при повторе отдается
+    одним элементом (переживает перезапуск приложения); прерванный поток не сохраняется.
+    Каждый элемент - dict:
+        rows - DataFrame итераций чанка (у сохраненного итога - пустой),
+        stats - {метрика: RunningStats.summary()},
+        histograms - {метрика: RunningHistogram.summary()},
+        ci_width - как monte_carlo_ci, converged - достигнут ли ci_width,
+        done, total - выполнено итераций и максимум.
+    Закрытие генератора (прерывание) останавливает и пул процессов.
+    """
+    store_inputs = {
+        **run_monte_carlo_simulation.store_inputs(
+            base_inputs, static_res, variation_pct, iterations, seed, workers, sampler, ci_width, include_weapon
+        ),
+        "quantiles": quantiles,
+    }
+    include_weapon = bool(include_weapon and base_inputs["simulate_weapon"])
+    stat_keys = MC_STREAM_KEYS + (MC_WEAPON_KEYS if include_weapon else ())
+    
+    stored = RESULT_STORE.get("monte_carlo_stream", store_inputs) if use_store else None
+    if stored is not None:
+        yield {"rows": pd.DataFrame(columns=MC_COLUMNS, dtype=float), **stored}
+        return
+    
+    tasks = _mc_tasks(((base_inputs, static_res, include_weapon),), variation_pct, iterations, seed, sampler)
+    workers = min(_resolve_workers(workers), max(len(tasks), 1))
+    wave = workers if ci_width is not None else max(len(tasks), 1)
+    
+    samples = {key: RunningStats(quantiles) for key in stat_keys}
+    histograms = {key: RunningHistogram() for key in stat_keys}
+    replicates = {key: RunningStats(quantiles=()) for key in MC_CI_KEYS}
+    done = 0
+    update = {"ci_width": {}, "converged": False}
+    
+    # Критерий проверяется после каждого чанка по порядку - точка останова
+    # (и результат) не зависит от числа процессов
+    for [(columns, sim_stats)] in _iter_chunks(tasks, workers, wave):
+        values = {**columns, **sim_stats}
+        rows = pd.DataFrame({
+            "iteration": np.arange(done, done + len(columns["kv_used"])),
+            **{key: values[key] for key in MC_COLUMNS[1:]},
+            **{key: values[key] for key in MC_WEAPON_COLUMNS if include_weapon},
+        })
+        done += len(rows)
+        for key in stat_keys:
+            samples[key].update(values[key])
+            histograms[key].update(values[key])
+        for key in MC_CI_KEYS:
+            replicates[key].update([np.mean(sim_stats[key])])
+        
+        widths = monte_carlo_ci(samples, replicates, sampler)
+        converged = ci_width is not None and all(w <= ci_width for w in widths.values())
+        update = {
+            "rows": rows,
+            "stats": {key: running.summary() for key, running in samples.items()},
+            "histograms": {key: histogram.summary() for key, histogram in histograms.items()},
+            "ci_width": widths,
+            "converged": converged,
+            "done": done,
+            "total": iterations,
+        }
+        yield update
+        if converged:
+            break
+    
+    if use_store and "stats" in update:
+        RESULT_STORE.put("monte_carlo_stream", store_inputs, {key: val for key, val in update.items() if key != "rows"})
+
+
+def _mc_frame(frames: List[pd.DataFrame], sampler: str, update: Dict) -> pd.DataFrame:
+    """Итоговый DataFrame Монте-Карло из чанков потока (attrs - по последнему элементу)."""
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = pd.DataFrame({col: np.empty(0) for col in MC_COLUMNS})
+    df.attrs.update(sampler=sampler, ci_width=update["ci_width"], converged=update["converged"])
+    return df
+
+
+@RESULT_STORE.persistent("monte_carlo", ignore=("workers",))
 def run_monte_carlo_simulation(
     base_inputs: Dict,
     static_res: Dict,
     variation_pct: float = 0.10,  # 10% разброс (3 сигма)
-    iterations: int = 100
+    iterations: int = 100,
+    seed: int = MC_SEED,
+    workers: int = 1,
+    sampler: str = "random",
+    ci_width: float = None,
+    include_weapon: bool = False
 ) -> pd.DataFrame:
     """
     Вероятностное моделирование (Monte Carlo).
     Варьирует ключевые параметры: KV, трение, напряжение, сопротивление.
-    """
-    results = []
     
-    # Генераторы случайных чисел (нормальное распределение)
-    # variation_pct считается как "3 сигма" (99.7% значений попадают в этот диапазон)
-    sigma_scale = variation_pct / 3.0
-    
-    rng = np.random.default_rng(42)  # Fixed seed for reproducibility
+    Итерации делятся на чанки (_mc_chunk_size) со своими потоками случайных
+    чисел из SeedSequence(seed).spawn. workers > 1 (или -1 - все ядра) раздает
+    чанки пулу процессов; результат совпадает бит в бит при любом workers.
+    sampler - схема выборки из MC_SAMPLERS.
+    ci_width - автостоп: расчет заканчивается после чанка, на котором ДИ
+    средних по MC_CI_KEYS сузились до этой доли среднего (iterations - максимум).
+    include_weapon - канал оружия тоже моделируется (если оно есть в base_inputs):
+    варьируются KV оружия, лимит его ESC и инерция ротора, время раскрутки каждой
+    итерации - weapon_spinup_time; добавляются колонки MC_WEAPON_COLUMNS.
+    В df.attrs: sampler, ci_width (достигнутые ширины), converged.
+    Потоковый вариант без накопления выборки - run_monte_carlo_stream
+    (хранит только итоговые статистики и гистограммы, отдельно от этой функции).
+    """
+    frames = []
+    update = {"ci_width": {}, "converged": False}
+    for update in run_monte_carlo_stream(
+        base_inputs, static_res, variation_pct, iterations, seed, workers, sampler, ci_width,
+        include_weapon, quantiles=(),  # выборка собирается целиком, P² не нужен
+        use_store=False  # хранилищем управляет декоратор (строки целиком)
+    ):
+        frames.append(update["rows"])
+    return _mc_frame(frames, sampler, update)
+
+
+@RESULT_STORE.persistent("monte_carlo_paired", ignore=("workers",))
+def run_paired_monte_carlo(
+    inputs_a: Dict,
+    inputs_b: Dict,
+    variation_pct: float = 0.10,
+    iterations: int = 500,
+    seed: int = MC_SEED,
+    workers: int = 1,
+    sampler: str = "random",
+    include_weapon: bool = False
+) -> pd.DataFrame:
+    """
+    Парный Монте-Карло (общие случайные числа): конфигурации A и B получают одни
+    и те же векторы возмущений (относительные отклонения от своих базовых значений)
+    и считаются одним батчем на чанк. Шум, общий для обеих, в разностях сокращается.
+    Аргументы - как у run_monte_carlo_simulation.
+    Возвращает DataFrame: iteration и по MC_PAIRED_METRICS колонки <m>_a, <m>_b, delta_<m> (B - A).
+    В df.attrs["summary"][метрика]: mean_delta, std_delta, ci_half (95% ДИ средней разности),
+    ci_half_unpaired (то же для независимых прогонов - для сравнения), p_b_better, p_tie.
+    """
+    configs = tuple(
+        (inputs, run_static_calculations(inputs), bool(include_weapon and inputs["simulate_weapon"]))
+        for inputs in (inputs_a, inputs_b)
+    )
+    tasks = _mc_tasks(configs, variation_pct, iterations, seed, sampler)
+    workers = min(_resolve_workers(workers), max(len(tasks), 1))
+    chunks = list(_iter_chunks(tasks, workers, max(len(tasks), 1)))
     
-    for i in range(iterations):
-        # Варьируем параметры
-        # 1. KV моторов (производственный разброс)
-        kv_factor = rng.normal(1.0, sigma_scale)
-        sim_kv = base_inputs["motor_kv"] * kv_factor
-        
-        # 2. Трение (сильно зависит от покрытия)
-        friction_factor = rng.normal(1.0, sigma_scale * 1.5) # Трение варьируется сильнее
-        sim_friction = max(0.1, min(1.5, base_inputs["friction_coeff"] * friction_factor))
+    df = pd.DataFrame({"iteration": np.arange(iterations)})
+    summary = {}
+    for key, higher_better in MC_PAIRED_METRICS.items():
+        parts_a = [pair[0][1][key] for pair in chunks]
+        parts_b = [pair[1][1][key] for pair in chunks]
+        value_a = np.concatenate(parts_a) if chunks else np.empty(0)
+        value_b = np.concatenate(parts_b) if chunks else np.empty(0)
+        delta = value_b - value_a
+        df[f"{key}_a"], df[f"{key}_b"], df[f"delta_{key}"] = value_a, value_b, delta
         
-        # 3. Сопротивление батареи (температура, заряд)
-        ir_factor = rng.normal(1.0, sigma_scale)
-        sim_ir = base_inputs["battery_ir_mohm"] * ir_factor
+        samples, replicates = RunningStats(()), RunningStats(())
+        samples.update(delta)
+        replicates.update([np.mean(b - a) for a, b in zip(parts_a, parts_b)])
+        unpaired = RunningStats(())
+        unpaired.update(value_a)
+        var_b = np.var(value_b, ddof=1) if len(value_b) > 1 else np.nan
         
-        # Собираем параметры для симуляции
-        sim_params = {
-            "voltage_nom": static_res["voltage_nom"], # Напряжение считаем номинальным, но IR "гуляет"
-            "battery_ir_mohm": sim_ir,
-            "drive_motor_count": base_inputs["drive_motor_count"],
-            "motor_kv": sim_kv,
-            "gear_ratio": base_inputs["gear_ratio"],
-            "wheel_dia_mm": base_inputs["wheel_dia_mm"],
-            "friction_coeff": sim_friction,
-            "esc_current_limit_drive": base_inputs["esc_current_limit_drive"],
-            "simulate_weapon": False, # Для ускорения отключаем оружие в Монте-Карло
-            "weapon_motor_count": 0,
-            "weapon_motor_kv": 0,
-            "weapon_reduction": 1,
-            "weapon_inertia": 0,
-            "esc_current_limit_weapon": 0,
+        better = delta > 0 if higher_better else delta < 0
+        summary[key] = {
+            "mean_delta": float(samples.mean),
+            "std_delta": samples.std,
+            "ci_half": _mc_ci_half(samples if sampler == "random" else replicates, sampler),
+            "ci_half_unpaired": float(ndtri(0.5 + MC_CI_LEVEL / 2) * np.sqrt((unpaired.var + var_b) / max(len(delta), 1))),
+            "p_b_better": float(np.mean(better)) if len(delta) else np.nan,
+            "p_tie": float(np.mean(delta == 0)) if len(delta) else np.nan,
         }
-        
-        # Запускаем короткую симуляцию (до 4 сек достаточно для разгона)
-        df_sim = simulate_full_system(sim_params, static_res["total_mass"], max_time=4.0)
-        
-        # Агрегируем результаты
-        peak_current = df_sim["I_bat"].max()
-        max_speed = df_sim["v_kmh"].max()
-        
-        # Время до 20 км/ч
-        try:
-            time_to_20 = df_sim[df_sim["v_kmh"] >= 20.0].iloc[0]["t"]
-        except IndexError:
-            time_to_20 = 4.0 # Не достиг
-            
-        results.append({
-            "iteration": i,
-            "kv_used": sim_kv,
-            "friction_used": sim_friction,
-            "peak_current": peak_current,
-            "max_speed": max_speed,
-            "time_to_20": time_to_20
-        })
-        
-    return pd.DataFrame(results)
+    
+    df.attrs.update(sampler=sampler, summary=summary)
+    return df
+
+
+# --------- Кэш результатов ---------
+
+def _estimated_size(value) -> int:
+    """Оценка занимаемой памяти результата, байт (массивы - по nbytes)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, SimulationResult):
+        return _estimated_size(value.columns)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimated_size(key) + _estimated_size(val) for key, val in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimated_size(val) for val in value)
+    return sys.getsizeof(value)
+
+
+_MISSING = object()  # маркер промаха (None - допустимый результат)
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов расчетов с ключом - хэшем полного набора входов.
+    Вытесняются давно не использованные записи, пока суммарный размер
+    не уложится в max_bytes. Не зависит от Streamlit.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # ключ -> (значение, размер)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str, default=None):
+        """Значение по ключу (запись становится самой свежей) или default."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value) -> None:
+        """Сохранение результата с вытеснением старых записей по размеру."""
+        size = _estimated_size(value)
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return  # результат крупнее всего кэша не храним
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self.total_bytes -= old_size
+            self.evictions += 1
+
+    def memoize(self, kind: str, func: Callable, *args, **kwargs) -> Any:
+        """func(*args, **kwargs) через кэш; kind разделяет разные расчеты с одинаковыми входами."""
+        key = input_hash(kind, args, kwargs)
+        value = self.get(key, default=_MISSING)
+        if value is _MISSING:
+            value = func(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Очистка записей и счетчиков."""
+        self._entries.clear()
+        self.total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Статистика: попадания, промахи, доля попаданий, записи, размер."""
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def cached_static_calculations(inputs: Dict) -> Dict:
+    """run_static_calculations через RESULT_CACHE (ключ - все поля inputs)."""
+    return dict(RESULT_CACHE.memoize("static", run_static_calculations, inputs))
+
+
+def cached_simulation_stats(params: Dict, total_mass_kg: float, max_time: float = 8.0, **options) -> Dict:
+    """
+    Метрики simulate_full_system(stats_only=True) через RESULT_CACHE.
+    options - прочие аргументы simulate_full_system (integrator, steady_state_tol, ...);
+    бэкенд входит в ключ.
+    """
+    return dict(RESULT_CACHE.memoize(
+        "sim_stats:" + _backend, simulate_full_system,
+        params, total_mass_kg, max_time, stats_only=True, **options
+    ))
+
+
+def cached_collision(
+    robot_mass: float,
+    weapon_inertia: float,
+    weapon_rpm: float,
+    target_mass: float = 110.0
+) -> Dict:
+    """analyze_collision через RESULT_CACHE."""
+    return dict(RESULT_CACHE.memoize(
+        "collision", analyze_collision, robot_mass, weapon_inertia, weapon_rpm, target_mass
+    ))
@@ -0,0 +1,405 @@
+"""
+Скомпилированные ядра simulate_full_system (Numba): шаги Эйлера для одной
+конфигурации и батча (последовательно или на потоках) и RK4/RK23 для одной конфигурации.
+
+Numba - необязательная зависимость: без нее модуль импортируется,
+но NUMBA_AVAILABLE = False и physics остается на чистом Python.
+Физика и порядок операций повторяют simulate_full_system, поэтому
+результаты совпадают с Python-бэкендом бит в бит (с steady_state_tol -
+с точностью до округления аналитического хвоста нагрева).
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def get_num_threads():
+        """Без numba потоков нет."""
+        return 1
+
+    def njit(*args, **kwargs):
+        """Заглушка декоратора: функции остаются обычным Python."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Строки out: v_kmh, dist, I_bat, U_bat, T_drive, T_weapon
+# Строки stats: порядок physics.SIM_STAT_KEYS
+# euler_batch_parallel раздает потокам numba (prange) блоки строк
+
+
+@njit(cache=True)
+def tail_temps(temp, power_first, power_second, n_steps, dt):
+    """Скалярная physics._tail_temps: (максимум, конец) нагрева на n_steps шагов."""
+    if n_steps == 0:
+        return temp, temp
+    a = 0.05 * dt
+    c1 = power_first * dt / 500.0 + 25.0 * a
+    c2 = power_second * dt / 500.0 + 25.0 * a
+    pair_gain = (1.0 - a) ** 2
+    temp_fix = ((1.0 - a) * c1 + c2) / (1.0 - pair_gain)
+    m_even = n_steps // 2
+    odd_last = (1.0 - a) * (temp_fix + (temp - temp_fix) * pair_gain ** float((n_steps - 1) // 2)) + c1
+    temp_max = max((1.0 - a) * temp + c1, odd_last)
+    even_last = temp_fix + (temp - temp_fix) * pair_gain ** float(m_even)
+    if m_even >= 1:
+        temp_max = max(temp_max, max(temp_fix + (temp - temp_fix) * pair_gain, even_last))
+    if n_steps % 2 == 0:
+        return temp_max, even_last
+    return temp_max, odd_last
+
+
+@njit(cache=True, error_model="numpy")
+def euler_rows(
+    lo, hi, mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel, n_motors_drive,
+    limit_drive, sim_weapon, weap_limit_total, weap_count_safe, weap_spinup,
+    force_friction_limit, force_rolling,
+    t_values, dt, max_time, target_kmh, record, out, stats,
+    steady_tol, window_steps, settle_step
+):
+    """
+    Шаги Эйлера для строк lo..hi-1 батча (константы - массивы длины N): внешний цикл
+    по времени, внутренний по строкам, чтобы независимые строки шли параллельно на конвейере.
+    record - запись траекторий в out (6, N, T) (строки - сразу колонки результата,
+    без транспонирования); бегущие метрики пишутся в stats (6, N).
+    steady_tol >= 0 (без record) - детектор установившегося режима как в
+    simulate_full_system: строка перестает шагаться (шаг останова - в settle_step,
+    -1 - не установилась), ее нагрев до конца горизонта досчитывается аналитически.
+    """
+    R_phase_drive = 0.05
+    heat_cap = 500.0
+    n = hi - lo
+
+    v = np.zeros(n)
+    dist = np.zeros(n)
+    temp_drive = np.full(n, 25.0)
+    temp_weap = np.full(n, 25.0)
+    reached_20 = np.zeros(n, dtype=np.bool_)
+    # Детектор: прошлый шаг и снимок (v_prev, v, i_prev, i) окном ранее
+    detect = steady_tol >= 0.0 and not record
+    v_prev = np.zeros(n)
+    i_prev = np.zeros(n)
+    snapshot = np.empty((4, n))
+    settle_step[lo:hi] = -1
+    active = n
+
+    stats[0, lo:hi] = -np.inf  # peak_current
+    stats[1, lo:hi] = np.inf  # min_voltage
+    stats[2, lo:hi] = -np.inf  # temp_drive_max
+    stats[3, lo:hi] = -np.inf  # temp_weap_max
+    stats[4, lo:hi] = -np.inf  # max_speed
+    stats[5, lo:hi] = max_time  # time_to_20 (не достиг)
+
+    for k in range(len(t_values)):
+        t = t_values[k]
+        check = detect and (k + 1) % window_steps == 0
+        for i in range(lo, hi):
+            r = i - lo  # индекс локального состояния строки
+            if settle_step[i] >= 0:
+                continue
+            # --- Ходовая ---
+            w_wheel = v[r] / r_wheel[i]
+            w_motor = w_wheel * gear_drive[i]
+            rpm_motor = w_motor * 60 / (2*np.pi)
+            back_emf = rpm_motor / kv_drive[i]
+
+            if U[i] > back_emf:
+                i_drive_raw = (U[i] - back_emf) / R_phase_drive
+            else:
+                i_drive_raw = 0.0
+            i_drive_limited = min(i_drive_raw, limit_drive[i])
+            i_drive_total = i_drive_limited * n_motors_drive[i]
+
+            torque_motor = i_drive_limited * kt_drive[i]
+            torque_wheel = torque_motor * gear_drive[i] * 0.8
+            force_propulsion = (torque_wheel * n_motors_drive[i]) / r_wheel[i]
+            force_real = min(force_propulsion, force_friction_limit[i])
+
+            force_drag = 0.5 * 1.2 * 0.5 * (v[r]**2) + force_rolling[i]
+
+            accel = (force_real - force_drag) / mass[i]
+            if accel < 0 and v[r] < 0.1:
+                accel = 0.0
+
+            v_new = v[r] + accel * dt
+            v[r] = v_new
+            dist[r] += v_new * dt
+
+            # --- Оружие ---
+            i_weap_total = 0.0
+            if sim_weapon[i]:
+                if t < weap_spinup[i]:
+                    i_weap_total = weap_limit_total[i]
+                else:
+                    i_weap_total = 10.0
+
+            # --- Батарея и Тепло ---
+            i_bat_total = i_drive_total + i_weap_total
+            u_actual = U[i] - i_bat_total * R_bat[i]
+
+            power_heat_drive = (i_drive_limited**2) * R_phase_drive
+            d_temp_drive = (power_heat_drive * dt) / heat_cap
+            d_temp_drive -= (temp_drive[r] - 25.0) * 0.05 * dt
+            temp_drive[r] += d_temp_drive
+
+            if sim_weapon[i]:
+                i_weap_single = i_weap_total / weap_count_safe[i]
+                power_heat_weap = (i_weap_single**2) * R_phase_drive
+                temp_weap[r] += ((power_heat_weap * dt) / heat_cap) - ((temp_weap[r] - 25.0) * 0.05 * dt)
+
+            v_kmh = v_new * 3.6
+            stats[0, i] = max(stats[0, i], i_bat_total)
+            stats[1, i] = min(stats[1, i], u_actual)
+            stats[2, i] = max(stats[2, i], temp_drive[r])
+            stats[3, i] = max(stats[3, i], temp_weap[r])
+            stats[4, i] = max(stats[4, i], v_kmh)
+            if not reached_20[r] and v_kmh >= target_kmh:
+                stats[5, i] = t
+                reached_20[r] = True
+
+            if record:
+                out[0, i, k] = v_kmh
+                out[1, i, k] = dist[r]
+                out[2, i, k] = i_bat_total
+                out[3, i, k] = u_actual
+                out[4, i, k] = temp_drive[r]
+                out[5, i, k] = temp_weap[r]
+
+            if check:
+                current = (v_prev[r], v_new, i_prev[r], i_drive_limited)
+                steady = k + 1 > window_steps
+                for j in range(4):
+                    anchor = snapshot[j, r]
+                    if abs(current[j] - anchor) > steady_tol * max(abs(anchor), 1.0):
+                        steady = False
+                    snapshot[j, r] = current[j]
+                if steady:
+                    settle_step[i] = k
+                    active -= 1
+                    # Хвост как в physics._steady_tail_temps
+                    n_rest = len(t_values) - k - 1
+                    n_spin = 0
+                    for j in range(k + 1, len(t_values)):
+                        if t_values[j] < weap_spinup[i]:
+                            n_spin += 1
+                    drive_max, _ = tail_temps(
+                        temp_drive[r], (i_prev[r]**2) * R_phase_drive,
+                        (i_drive_limited**2) * R_phase_drive, n_rest, dt
+                    )
+                    stats[2, i] = max(stats[2, i], drive_max)
+                    if sim_weapon[i]:
+                        p_spin = ((weap_limit_total[i] / weap_count_safe[i])**2) * R_phase_drive
+                        p_hold = ((10.0 / weap_count_safe[i])**2) * R_phase_drive
+                        spin_max, weap_mid = tail_temps(temp_weap[r], p_spin, p_spin, n_spin, dt)
+                        hold_max, _ = tail_temps(weap_mid, p_hold, p_hold, n_rest - n_spin, dt)
+                        stats[3, i] = max(stats[3, i], max(spin_max, hold_max))
+            v_prev[r] = v_new
+            i_prev[r] = i_drive_limited
+        if active == 0:
+            break
+
+
+@njit(cache=True, error_model="numpy")
+def euler_batch(
+    mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel, n_motors_drive,
+    limit_drive, sim_weapon, weap_limit_total, weap_count_safe, weap_spinup,
+    force_friction_limit, force_rolling,
+    t_values, dt, max_time, target_kmh, record, out, stats,
+    steady_tol, window_steps, settle_step
+):
+    """
+    euler_rows для всего батча. steady_tol >= 0 (без record) - детектор
+    установившегося режима как в simulate_full_system: строка перестает шагаться
+    (шаг останова - в settle_step, -1 - не установилась), ее нагрев до конца
+    горизонта досчитывается аналитически.
+    """
+    euler_rows(
+        0, len(mass),
+        mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel, n_motors_drive,
+        limit_drive, sim_weapon, weap_limit_total, weap_count_safe, weap_spinup,
+        force_friction_limit, force_rolling,
+        t_values, dt, max_time, target_kmh, record, out, stats,
+        steady_tol, window_steps, settle_step
+    )
+
+
+@njit(cache=True, error_model="numpy", parallel=True)
+def euler_batch_parallel(
+    mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel, n_motors_drive,
+    limit_drive, sim_weapon, weap_limit_total, weap_count_safe, weap_spinup,
+    force_friction_limit, force_rolling,
+    t_values, dt, max_time, target_kmh, record, out, stats,
+    steady_tol, window_steps, settle_step,
+    block
+):
+    """
+    euler_batch по блокам из block строк на потоках numba (prange): внутри блока
+    строки по-прежнему идут вперемешку по времени. Строки независимы - результат тот же.
+    """
+    n = len(mass)
+    for b in prange((n + block - 1) // block):
+        euler_rows(
+            b * block, min(n, (b + 1) * block),
+            mass, U, R_bat, kv_drive, kt_drive, gear_drive, r_wheel, n_motors_drive,
+            limit_drive, sim_weapon, weap_limit_total, weap_count_safe, weap_spinup,
+            force_friction_limit, force_rolling,
+            t_values, dt, max_time, target_kmh, record, out, stats,
+            steady_tol, window_steps, settle_step
+        )
+
+
+@njit(cache=True, error_model="numpy")
+def euler_single(
+    total_mass, voltage_nom, battery_ir_mohm, drive_motor_count, motor_kv, gear_ratio,
+    wheel_dia_mm, friction_coeff, esc_current_limit_drive, simulate_weapon,
+    weapon_motor_count, esc_current_limit_weapon, weapon_spinup_s, gravity,
+    max_time, target_kmh, record, steady_tol, window_steps
+):
+    """
+    Одна конфигурация (скаляры params): константы physics._single_constants,
+    сетка времени и буферы строятся здесь же, без словарей Python на каждый вызов.
+    Возвращает (t_values, out (6, T), stats (6,), шаг останова).
+    """
+    dt = 0.05
+    t_values = np.arange(0.0, max_time, dt)
+    out = np.empty((6, 1, len(t_values) if record else 0))
+    stats = np.empty((6, 1))
+    settle_step = np.empty(1, dtype=np.int64)
+
+    def one(value):
+        return np.full(1, value)
+
+    euler_rows(
+        0, 1, one(total_mass), one(voltage_nom), one(battery_ir_mohm / 1000.0), one(motor_kv),
+        one(9.55 / motor_kv if motor_kv > 0 else 0.0), one(gear_ratio), one((wheel_dia_mm / 1000.0) / 2.0),
+        one(drive_motor_count), one(esc_current_limit_drive), np.full(1, simulate_weapon),
+        one(esc_current_limit_weapon * weapon_motor_count),
+        one(weapon_motor_count if weapon_motor_count > 0 else 1.0), one(weapon_spinup_s),
+        one(friction_coeff * total_mass * gravity), one(0.02 * total_mass * gravity),
+        t_values, dt, max_time, target_kmh, record, out, stats,
+        steady_tol, window_steps, settle_step
+    )
+    return t_values, out[:, 0], stats[:, 0], settle_step[0]
+
+
+@njit(cache=True)
+def rk_single(
+    rk23, mass, U, kv_drive, gear_drive, r_wheel, limit_drive, force_per_amp,
+    force_friction_limit, force_rolling, sim_weapon, i_weap_spin, i_weap_hold,
+    weap_count_safe, weap_spinup, max_time, h, rtol, max_dt
+):
+    """
+    RK4 (rk23=False, шаг h) или адаптивный RK23 (начальный шаг h) для одной
+    конфигурации на скалярах: та же схема и порядок операций, что в
+    physics._simulate_rk, без батчевых массивов (4, N). Без numba - обычный Python.
+    Возвращает (t, состояния (4, T): v, dist, T_drive, T_weapon, ток ходовой одного
+    мотора, ток оружия) в узлах сетки.
+    """
+    R_phase_drive = 0.05
+    heat_cap = 500.0
+
+    def rates(spinning, v, temp_drive, temp_weap):
+        w_motor = (v / r_wheel) * gear_drive
+        back_emf = w_motor * 60 / (2*np.pi) / kv_drive
+        if U > back_emf:
+            i_drive_raw = (U - back_emf) / R_phase_drive
+        else:
+            i_drive_raw = 0.0
+        i_drive_limited = min(i_drive_raw, limit_drive)
+
+        force_real = min(i_drive_limited * force_per_amp, force_friction_limit)
+        force_drag = 0.5 * 1.2 * 0.5 * (v**2) + force_rolling
+        accel = (force_real - force_drag) / mass
+        if accel < 0 and v < 0.1:
+            accel = 0.0
+
+        i_weap_total = i_weap_spin if spinning else i_weap_hold
+        d_temp_drive = ((i_drive_limited**2) * R_phase_drive) / heat_cap - (temp_drive - 25.0) * 0.05
+        d_temp_weap = 0.0
+        if sim_weapon:
+            power_heat_weap = ((i_weap_total / weap_count_safe)**2) * R_phase_drive
+            d_temp_weap = power_heat_weap / heat_cap - (temp_weap - 25.0) * 0.05
+        return accel, v, d_temp_drive, d_temp_weap, i_drive_limited, i_weap_total
+
+    capacity = int(max_time / h) + 2 if not rk23 else int(max_time / max_dt) + 16
+    times = np.empty(capacity)
+    out = np.empty((6, capacity))
+    count = 0
+
+    t = 0.0
+    v, dist, temp_drive, temp_weap = 0.0, 0.0, 25.0, 25.0
+    a1, b1, c1, d1, i_drive, i_weap = rates(t < weap_spinup, v, temp_drive, temp_weap)
+    while True:
+        # Запись узла (массивы растут вдвое, если rk23 взял больше шагов)
+        if count == capacity:
+            capacity *= 2
+            grown_t = np.empty(capacity)
+            grown_t[:count] = times
+            grown_out = np.empty((6, capacity))
+            grown_out[:, :count] = out
+            times, out = grown_t, grown_out
+        times[count] = t
+        out[0, count] = v
+        out[1, count] = dist
+        out[2, count] = temp_drive
+        out[3, count] = temp_weap
+        out[4, count] = i_drive
+        out[5, count] = i_weap
+        count += 1
+
+        if not rk23:
+            if count > int(round(max_time / h)):
+                break
+            spinning = t < weap_spinup
+            a2, b2, c2, d2, _, _ = rates(spinning, v + (h / 2) * a1, temp_drive + (h / 2) * c1, temp_weap + (h / 2) * d1)
+            a3, b3, c3, d3, _, _ = rates(spinning, v + (h / 2) * a2, temp_drive + (h / 2) * c2, temp_weap + (h / 2) * d2)
+            a4, b4, c4, d4, _, _ = rates(spinning, v + h * a3, temp_drive + h * c3, temp_weap + h * d3)
+            v = v + (h / 6) * (a1 + 2 * a2 + 2 * a3 + a4)
+            dist = dist + (h / 6) * (b1 + 2 * b2 + 2 * b3 + b4)
+            temp_drive = temp_drive + (h / 6) * (c1 + 2 * c2 + 2 * c3 + c4)
+            temp_weap = temp_weap + (h / 6) * (d1 + 2 * d2 + 2 * d3 + d4)
+            t = count * h
+            a1, b1, c1, d1, i_drive, i_weap = rates(t < weap_spinup, v, temp_drive, temp_weap)
+            continue
+
+        # RK23 (Богацкий-Шампайн): шаги до принятого, граница раскрутки и max_time - узлы
+        atol = 1e-3
+        accepted = False
+        while not accepted and t < max_time - 1e-12:
+            if 0 < weap_spinup < max_time and weap_spinup > t + 1e-12:
+                next_break = weap_spinup
+            else:
+                next_break = max_time
+            h = min(h, max_dt, next_break - t)
+            spinning = t < weap_spinup
+            a2, b2, c2, d2, _, _ = rates(spinning, v + (h / 2) * a1, temp_drive + (h / 2) * c1, temp_weap + (h / 2) * d1)
+            a3, b3, c3, d3, _, _ = rates(spinning, v + (3 * h / 4) * a2, temp_drive + (3 * h / 4) * c2, temp_weap + (3 * h / 4) * d2)
+            v_new = v + h * ((2 / 9) * a1 + (1 / 3) * a2 + (4 / 9) * a3)
+            dist_new = dist + h * ((2 / 9) * b1 + (1 / 3) * b2 + (4 / 9) * b3)
+            temp_drive_new = temp_drive + h * ((2 / 9) * c1 + (1 / 3) * c2 + (4 / 9) * c3)
+            temp_weap_new = temp_weap + h * ((2 / 9) * d1 + (1 / 3) * d2 + (4 / 9) * d3)
+            a4, b4, c4, d4, i_drive_new, i_weap_new = rates(spinning, v_new, temp_drive_new, temp_weap_new)
+            # Оценка ошибки по скорости и температурам (дистанция не контролируется)
+            err_norm = max(
+                abs(h * ((-5 / 72) * a1 + (1 / 12) * a2 + (1 / 9) * a3 + (-1 / 8) * a4)) / (atol + rtol * abs(v_new)),
+                abs(h * ((-5 / 72) * c1 + (1 / 12) * c2 + (1 / 9) * c3 + (-1 / 8) * c4)) / (atol + rtol * abs(temp_drive_new)),
+                abs(h * ((-5 / 72) * d1 + (1 / 12) * d2 + (1 / 9) * d3 + (-1 / 8) * d4)) / (atol + rtol * abs(temp_weap_new)),
+            )
+            if err_norm <= 1.0:
+                t_new = next_break if next_break - (t + h) < 1e-9 else t + h
+                if (t_new < weap_spinup) == spinning:
+                    a1, b1, c1, d1, i_drive, i_weap = a4, b4, c4, d4, i_drive_new, i_weap_new  # FSAL
+                else:
+                    a1, b1, c1, d1, i_drive, i_weap = rates(t_new < weap_spinup, v_new, temp_drive_new, temp_weap_new)
+                t, v, dist, temp_drive, temp_weap = t_new, v_new, dist_new, temp_drive_new, temp_weap_new
+                accepted = True
+            factor = 5.0 if err_norm == 0 else min(5.0, max(0.2, 0.9 * err_norm ** (-1 / 3)))
+            h *= factor
+        if not accepted:
+            break
+
+    return times[:count], out[:, :count]
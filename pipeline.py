@@ -0,0 +1,210 @@
+"""
+Инкрементальный конвейер расчетов (статика -> симуляция, столкновение).
+
+Каждая стадия объявляет, от чего зависит: ключи входов ("motor_kv") и
+результаты других стадий - целиком ("sim_params") или отдельным полем
+("static.total_mass"). При очередном прогоне (перерисовка Streamlit) стадия
+пересчитывается, только если изменилось значение хотя бы одной зависимости;
+иначе отдается ее прошлый результат. Сравниваются значения, а не факт
+пересчета: если статика пересчитана, но total_mass та же, симуляция не
+запускается.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from physics import (
+    cached_static_calculations,
+    cached_simulation_stats,
+    cached_collision,
+    simulate_full_system_stream,
+    SimulationResult,
+)
+from result_store import input_hash
+
+
+class Stage:
+    """Стадия конвейера: func получает dict {зависимость: значение}."""
+
+    def __init__(self, name: str, func: Callable[[Dict], Any], deps: Sequence[str]):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+    def upstream(self) -> List[str]:
+        """Имена стадий, от которых зависит эта (по префиксу до точки)."""
+        return [dep.split(".", 1)[0] for dep in self.deps]
+
+
+class Pipeline:
+    """
+    Граф стадий с пересчетом по изменению зависимостей.
+    Ссылка, совпадающая с именем стадии (или "стадия.поле"), - результат стадии,
+    остальное - ключ входов (отсутствующий во входах ключ пропускается).
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Повтор стадии: {stage.name}")
+            self.stages[stage.name] = stage
+        self.order = self._topological_order()
+        self._fingerprints = {}  # стадия -> хэш значений зависимостей
+        self._results = {}  # стадия -> последний результат
+        self.last_recomputed = []  # стадии, пересчитанные в последнем run
+        self.runs = {name: 0 for name in self.order}  # число пересчетов по стадиям
+
+    def _topological_order(self) -> List[str]:
+        """Порядок стадий: зависимости раньше зависимых; цикл - ValueError."""
+        order, state = [], {}  # state: 1 - в обходе, 2 - готово
+
+        def visit(name: str) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Циклическая зависимость стадий через {name}")
+            state[name] = 1
+            for dep in self.stages[name].upstream():
+                if dep in self.stages:
+                    visit(dep)
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _resolve(self, dep: str, inputs: Dict) -> Any:
+        stage, _, field = dep.partition(".")
+        if stage in self.stages:
+            result = self._results[stage]
+            return result[field] if field else result
+        return inputs[dep]
+
+    def run(self, inputs: Dict) -> Dict[str, Any]:
+        """Прогон конвейера; возвращает {стадия: результат} (dict-результаты - копии)."""
+        self.last_recomputed = []
+        for name in self.order:
+            stage = self.stages[name]
+            values = {
+                dep: self._resolve(dep, inputs)
+                for dep in stage.deps
+                if dep.split(".", 1)[0] in self.stages or dep in inputs
+            }
+            fingerprint = input_hash(values)
+            if self._fingerprints.get(name) != fingerprint:
+                self._results[name] = stage.func(values)
+                self._fingerprints[name] = fingerprint
+                self.last_recomputed.append(name)
+                self.runs[name] += 1
+        return {
+            name: dict(result) if isinstance(result, dict) else result
+            for name, result in self._results.items()
+        }
+
+    def reset(self) -> None:
+        """Забыть прошлые результаты (следующий run пересчитает все)."""
+        self._fingerprints.clear()
+        self._results.clear()
+
+
+class StreamedResult:
+    """
+    Результат стадии, который считается потоком: первый полный обход
+    итератора отдает чанки по мере расчета (графики дорисовываются) и
+    запоминает их; после этого result - склеенный SimulationResult.
+    Прерванный обход (Stop Streamlit) при следующем обходе начинается заново.
+    """
+
+    def __init__(self, factory: Callable[[], Iterator[SimulationResult]]):
+        self._factory = factory
+        self.result = None
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def __iter__(self):
+        if self.done:
+            yield self.result
+            return
+        chunks = []
+        for chunk in self._factory():
+            chunks.append(chunk)
+            yield chunk
+        self.result = SimulationResult(
+            {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0].columns},
+            chunks[0].max_time
+        )
+
+
+# --------- Конвейер приложения ---------
+
+# Входы статики (armor_density_kg_m3 - необязательный)
+STATIC_KEYS = (
+    "voltage_s", "motor_kv", "gear_ratio", "wheel_dia_mm",
+    "simulate_weapon", "weapon_motor_kv", "weapon_reduction",
+    "weapon_mass_kg", "weapon_radius_mm",
+    "armor_thickness", "armor_coverage", "armor_area_total", "armor_density_kg_m3",
+    "base_drive_mass", "base_elec_mass", "base_frame_mass",
+)
+# Входы симуляции помимо статики
+SIM_KEYS = (
+    "battery_ir_mohm", "drive_motor_count", "motor_kv", "gear_ratio", "wheel_dia_mm",
+    "friction_coeff", "esc_current_limit_drive", "simulate_weapon",
+    "weapon_motor_count", "weapon_motor_kv", "weapon_reduction", "esc_current_limit_weapon",
+)
+SIM_STATIC_FIELDS = ("voltage_nom", "weapon_inertia")
+SIM_MAX_TIME = 8.0
+COLLISION_TARGET_MASS = 110.0
+
+# Параметры оружия, которые не влияют на симуляцию при simulate_weapon=False
+_WEAPON_SIM_KEYS = (
+    "weapon_motor_count", "weapon_motor_kv", "weapon_reduction",
+    "weapon_inertia", "esc_current_limit_weapon",
+)
+
+
+def _sim_params(values: Dict) -> Dict:
+    """Параметры simulate_full_system; при выключенном оружии его поля обнуляются."""
+    params = {key: values[key] for key in SIM_KEYS}
+    params["voltage_nom"] = values["static.voltage_nom"]
+    params["weapon_inertia"] = values["static.weapon_inertia"]
+    if not params["simulate_weapon"]:
+        params.update({key: 0 for key in _WEAPON_SIM_KEYS})
+    return params
+
+
+def build_robot_pipeline() -> Pipeline:
+    """
+    Конвейер main: static -> sim_params -> sim_stats и trajectory (траектория
+    для графиков, потоком), static -> collision.
+    """
+    return Pipeline([
+        Stage("static", cached_static_calculations, STATIC_KEYS),
+        Stage(
+            "sim_params", _sim_params,
+            SIM_KEYS + tuple(f"static.{field}" for field in SIM_STATIC_FIELDS)
+        ),
+        Stage(
+            "sim_stats",
+            lambda v: cached_simulation_stats(v["sim_params"], v["static.total_mass"], max_time=SIM_MAX_TIME),
+            ("sim_params", "static.total_mass")
+        ),
+        Stage(
+            "trajectory",
+            lambda v: StreamedResult(lambda: simulate_full_system_stream(
+                v["sim_params"], v["static.total_mass"], max_time=SIM_MAX_TIME
+            )),
+            ("sim_params", "static.total_mass")
+        ),
+        Stage(
+            "collision",
+            lambda v: cached_collision(
+                v["static.total_mass"], v["static.weapon_inertia"], v["static.weapon_rpm"],
+                target_mass=COLLISION_TARGET_MASS
+            ),
+            ("static.total_mass", "static.weapon_inertia", "static.weapon_rpm")
+        ),
+    ])
@@ -0,0 +1,221 @@
+"""
+Персистентное хранилище результатов тяжелых расчетов (SQLite на диске).
+
+Сканы, Монте-Карло и оптимизация переживают перезапуск Streamlit:
+ключ - хэш входов (без имени конфигурации) и версии модели (physics.MODEL_VERSION).
+Записи другой версии удаляются при открытии, суммарный размер ограничен
+(вытесняются давно не читанные). Ошибки диска не ломают расчет -
+хранилище просто работает как промах.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "ROBOT_RESULT_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite")
+)
+DEFAULT_STORE_MAX_BYTES = 256 * 1024 * 1024
+# Поля входов, не влияющие на расчет (имя конфигурации): в ключ записи не входят
+NON_PHYSICAL_KEYS = ("name",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model_version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+)
+"""
+
+
+def _canonical(obj):
+    """Приведение numpy-значений к JSON-типам для канонического хэша."""
+    if isinstance(obj, np.ndarray):
+        return {"dtype": str(obj.dtype), "shape": list(obj.shape), "data": obj.tolist()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Нехэшируемое значение: {type(obj).__name__}")
+
+
+def input_hash(*parts) -> str:
+    """
+    Канонический хэш входов (sha256 от JSON с сортировкой ключей):
+    одинаковые по значению dict дают одинаковый ключ независимо от порядка полей.
+    """
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def physical_inputs(obj):
+    """Входы без NON_PHYSICAL_KEYS на любом уровне вложенности (dict, list, tuple)."""
+    if isinstance(obj, dict):
+        return {key: physical_inputs(val) for key, val in obj.items() if key not in NON_PHYSICAL_KEYS}
+    if isinstance(obj, (list, tuple)):
+        return [physical_inputs(val) for val in obj]
+    return obj
+
+
+class ResultStore:
+    """Хранилище результатов: kind + входы + версия модели -> pickle результата."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_STORE_PATH,
+        model_version: int = 1,
+        max_bytes: int = DEFAULT_STORE_MAX_BYTES
+    ):
+        self.path = path
+        self.model_version = model_version
+        self.max_bytes = max_bytes
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение на операцию (Streamlit вызывает из разных потоков)."""
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        if not self._ready:
+            with conn:
+                conn.execute(_SCHEMA)
+                # Инвалидация: результаты другой версии модели больше не верны
+                conn.execute("DELETE FROM results WHERE model_version != ?", (self.model_version,))
+            self._ready = True
+        return conn
+
+    def key(self, kind: str, inputs: Dict) -> str:
+        """
+        Ключ записи: хэш вида расчета, версии модели и входов без косметических
+        полей (переименованная конфигурация попадает в ту же запись).
+        """
+        return input_hash(kind, self.model_version, physical_inputs(inputs))
+
+    def get(self, kind: str, inputs: Dict, default=None) -> Any:
+        """Сохраненный результат или default (в том числе для нехэшируемых входов)."""
+        try:
+            key = self.key(kind, inputs)
+            conn = self._connect()
+            try:
+                with conn:
+                    row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                    if row is None:
+                        return default
+                    conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            finally:
+                conn.close()
+            return pickle.loads(row[0])
+        except (sqlite3.Error, OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+            return default
+
+    def put(self, kind: str, inputs: Dict, value: Any) -> None:
+        """
+        Запись результата с вытеснением давно не читанных записей по размеру.
+        Нехэшируемые входы и непиклуемые результаты не пишутся.
+        """
+        try:
+            key = self.key(kind, inputs)
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(payload) > self.max_bytes:
+                return
+            now = time.time()
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, kind, self.model_version, now, now, len(payload), payload)
+                    )
+                    self._evict(conn)
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError, pickle.PicklingError, TypeError, ValueError, AttributeError):
+            pass
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Удаление самых давно читанных записей, пока размер не уложится в max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get_or_compute(self, kind: str, inputs: Dict, compute: Callable[[], Any]) -> Any:
+        """Результат из хранилища, иначе compute() с записью."""
+        value = self.get(kind, inputs, default=_MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(kind, inputs, value)
+        return value
+
+    def persistent(self, kind: str, ignore: Tuple[str, ...] = ()) -> Callable:
+        """
+        Декоратор: результат функции хранится по всем ее аргументам
+        (с учетом значений по умолчанию). ignore - аргументы, не влияющие
+        на результат (например, число процессов), в ключ не входят.
+        wrapper.store_inputs(*args, **kwargs) - входы ключа для тех же аргументов.
+        """
+        def decorator(func: Callable) -> Callable:
+            signature = inspect.signature(func)
+
+            def store_inputs(*args, **kwargs) -> Dict:
+                """Входы ключа записи для этих аргументов (для get/put в обход декоратора)."""
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return {name: value for name, value in bound.arguments.items() if name not in ignore}
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.get_or_compute(kind, store_inputs(*args, **kwargs), lambda: func(*args, **kwargs))
+            wrapper.store_inputs = store_inputs
+            return wrapper
+        return decorator
+
+    def clear(self) -> None:
+        """Удаление всех записей."""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM results")
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            pass
+
+    def stats(self) -> Dict:
+        """Число записей и суммарный размер по видам расчетов."""
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT kind, COUNT(*), SUM(size) FROM results GROUP BY kind"
+                ).fetchall()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            rows = []
+        return {
+            "path": self.path,
+            "model_version": self.model_version,
+            "entries": sum(count for _, count, _ in rows),
+            "bytes": sum(size for _, _, size in rows),
+            "max_bytes": self.max_bytes,
+            "by_kind": {kind: count for kind, count, _ in rows},
+        }
+
+
+_MISSING = object()  # маркер промаха (None - допустимый результат)
@@ -0,0 +1,174 @@
+"""
+Бегущие статистики для потоковых расчетов (Монте-Карло по чанкам).
+
+Выборка не хранится: среднее и дисперсия - Welford со слиянием чанков
+(формула Chan et al.), квантили - алгоритм P² (Jain, Chlamtac): пять
+маркеров на квантиль, O(1) памяти. Гистограмма - счетчики бинов постоянной
+ширины (RunningHistogram).
+"""
+import numpy as np
+from typing import Dict, Tuple
+
+DEFAULT_QUANTILES = (0.025, 0.5, 0.975)
+
+
+class P2Quantile:
+    """Оценка квантиля p алгоритмом P² (пять маркеров, без хранения выборки)."""
+
+    def __init__(self, p: float):
+        self.p = p
+        self.heights = []  # высоты маркеров
+        self.positions = [0, 1, 2, 3, 4]  # фактические позиции (с нуля)
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]  # желаемые позиции
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        """Добавление наблюдения."""
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        # Ячейка k, в которую попало x; крайние маркеры расширяются
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Сдвиг средних маркеров к желаемым позициям
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Параболическая интерполяция, при нарушении порядка - линейная
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self) -> float:
+        """Текущая оценка (до пяти наблюдений - точный квантиль)."""
+        if not self.heights:
+            return float("nan")
+        if len(self.heights) < 5:
+            return float(np.quantile(self.heights, self.p))
+        return float(self.heights[2])
+
+
+class RunningStats:
+    """Бегущие число, среднее, дисперсия, минимум, максимум и квантили одной величины."""
+
+    def __init__(self, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # сумма квадратов отклонений от среднего
+        self.min = np.inf
+        self.max = -np.inf
+        self._quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def update(self, values) -> None:
+        """Добавление чанка значений (слияние моментов по Chan et al.)."""
+        values = np.asarray(values, dtype=float).ravel()
+        count = len(values)
+        if count == 0:
+            return
+        chunk_mean = values.mean()
+        chunk_m2 = np.sum((values - chunk_mean) ** 2)
+
+        total = self.n + count
+        delta = chunk_mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += chunk_m2 + delta ** 2 * self.n * count / total
+        self.n = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        for estimator in self._quantiles.values():
+            for x in values.tolist():
+                estimator.add(x)
+
+    @property
+    def var(self) -> float:
+        """Несмещенная дисперсия (nan при n < 2)."""
+        return self.m2 / (self.n - 1) if self.n > 1 else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.var))
+
+    def quantile(self, p: float) -> float:
+        """Оценка квантиля p (только из заданных при создании)."""
+        return self._quantiles[p].value()
+
+    def summary(self) -> Dict:
+        """Снимок статистик (dict, безопасно отдавать наружу)."""
+        return {
+            "n": self.n,
+            "mean": float(self.mean),
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {p: est.value() for p, est in self._quantiles.items()},
+        }
+
+
+class RunningHistogram:
+    """
+    Гистограмма с постоянной шириной бинов, пополняемая чанками: ширина - 1/nbins
+    размаха первого чанка, при выходе значений за края добавляются бины.
+    Хранятся только счетчики.
+    """
+
+    def __init__(self, nbins: int = 20):
+        self.nbins = nbins
+        self.origin = None
+        self.width = None
+        self.first = 0  # индекс первого бина относительно origin
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values) -> None:
+        """Добавление чанка значений (нечисловые и бесконечные пропускаются)."""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        if self.width is None:
+            self.origin = values.min()
+            span = values.max() - self.origin
+            self.width = span / self.nbins if span > 0 else max(abs(self.origin) * 0.01, 1e-9)
+        idx = np.floor((values - self.origin) / self.width).astype(np.int64)
+        # Максимум первого чанка - в последний бин, а не в новый
+        idx = np.where(values == self.origin + self.nbins * self.width, idx - 1, idx)
+        low = min(idx.min(), self.first) if len(self.counts) else idx.min()
+        high = max(idx.max(), self.first + len(self.counts) - 1) if len(self.counts) else idx.max()
+        counts = np.zeros(high - low + 1, dtype=np.int64)
+        counts[self.first - low:self.first - low + len(self.counts)] = self.counts
+        counts += np.bincount(idx - low, minlength=len(counts))
+        self.first, self.counts = low, counts
+
+    @property
+    def edges(self) -> np.ndarray:
+        if self.width is None:
+            return np.zeros(1)
+        return self.origin + self.width * np.arange(self.first, self.first + len(self.counts) + 1)
+
+    def summary(self) -> Dict:
+        """Снимок: границы и счетчики бинов."""
+        return {"edges": self.edges, "counts": self.counts.copy()}
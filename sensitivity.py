@@ -0,0 +1,118 @@
+"""
+Глобальная чувствительность (индексы Соболя).
+
+В отличие от run_parameter_scan (один параметр при остальных базовых) все
+SCANNABLE_PARAMS варьируются одновременно равномерно по своим диапазонам,
+так что видны и взаимодействия: ST - S1 - доля дисперсии, которую параметр
+дает только вместе с другими.
+Выборка Салтелли (матрицы A, B и AB_i из последовательности Соболя размерности 2k),
+оценки - Saltelli (2010) для S1 и Jansen (1999) для ST. Все N*(k+2) конфигураций
+считаются одной векторной статикой и одним батчевым прогоном симуляции
+(analysis.evaluate_scan_points).
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from typing import Dict, List
+from physics import RESULT_STORE
+from analysis import SCANNABLE_PARAMS, evaluate_scan_points
+
+# Исследуемые выходы: колонка метрик скана -> (название, единица).
+# Ток - на пределе сцепления, без лимита ESC: пиковый ток скана (оружие отключено)
+# упирается в лимит при любых SCANNABLE_PARAMS, и все его индексы были бы нулевыми.
+SENSITIVITY_OUTPUTS = {
+    "speed_kmh": ("Скорость", "км/ч"),
+    "traction_current": ("Ток на пределе сцепления", "А"),
+    "time_to_20": ("Разгон до 20 км/ч", "с"),
+    "temp_max": ("Температура моторов", "°C"),
+}
+
+
+def saltelli_sample(bounds: List[tuple], n_base: int, seed: int = 42) -> np.ndarray:
+    """
+    Выборка Салтелли: блоки A, B, AB_1..AB_k (каждый n_base x k) подряд,
+    всего n_base*(k+2) строк. AB_i - это A со столбцом i из B.
+    n_base округляется вверх до степени двойки (баланс последовательности Соболя).
+    """
+    k = len(bounds)
+    n_base = 1 << max(int(np.ceil(np.log2(max(n_base, 2)))), 1)
+    base = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random(n_base)
+    lower, upper = np.array(bounds, dtype=float).T
+    a = qmc.scale(base[:, :k], lower, upper)
+    b = qmc.scale(base[:, k:], lower, upper)
+
+    ab = np.repeat(a[None, :, :], k, axis=0)
+    for i in range(k):
+        ab[i, :, i] = b[:, i]
+    return np.concatenate([a, b, ab.reshape(-1, k)])
+
+
+def sobol_indices(y: np.ndarray, k: int, n_bootstrap: int = 100, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Индексы первого порядка S1 (Saltelli 2010) и полные ST (Jansen 1999) по выходам
+    модели на выборке saltelli_sample. 95% полуширины S1_conf/ST_conf - бутстрепом
+    по строкам базовой выборки. Постоянный выход (нулевая дисперсия) дает нули.
+    """
+    n = len(y) // (k + 2)
+    f_a = y[:n]
+    f_b = y[n:2 * n]
+    f_ab = y[2 * n:].reshape(k, n)
+
+    def estimate(rows):
+        a, b, ab = f_a[rows], f_b[rows], f_ab[:, rows]
+        # Центрирование: оценка S1 не зависит от сдвига в среднем, но ее разброс - зависит
+        center = np.mean(np.concatenate([a, b]))
+        a, b, ab = a - center, b - center, ab - center
+        var = np.var(np.concatenate([a, b]))
+        if var == 0:
+            return np.zeros(k), np.zeros(k)
+        first = np.mean(b * (ab - a), axis=-1) / var
+        total = 0.5 * np.mean((a - ab) ** 2, axis=-1) / var
+        return first, total
+
+    s1, st = estimate(np.arange(n))
+    rng = np.random.default_rng(seed)
+    boot = [estimate(rng.integers(0, n, n)) for _ in range(n_bootstrap)]
+    s1_conf = 1.96 * np.std([b[0] for b in boot], axis=0)
+    st_conf = 1.96 * np.std([b[1] for b in boot], axis=0)
+    return {"S1": s1, "S1_conf": s1_conf, "ST": st, "ST_conf": st_conf}
+
+
+def evaluate_designs(base_inputs: Dict, designs: np.ndarray, params: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Выходы SENSITIVITY_OUTPUTS для матрицы конфигураций (строки - точки, столбцы - params):
+    метрики скана analysis.evaluate_scan_points (одна векторная статика и один батч).
+    """
+    metrics = evaluate_scan_points(base_inputs, {name: designs[:, j] for j, name in enumerate(params)})
+    return {key: metrics[key] for key in SENSITIVITY_OUTPUTS}
+
+
+@RESULT_STORE.persistent("sensitivity")
+def run_sensitivity_analysis(
+    base_inputs: Dict,
+    n_base: int = 1024,
+    params: List[str] = None,
+    seed: int = 42,
+    n_bootstrap: int = 100
+) -> pd.DataFrame:
+    """
+    Индексы Соболя для всех выходов SENSITIVITY_OUTPUTS по параметрам params
+    (по умолчанию все SCANNABLE_PARAMS, диапазоны оттуда же).
+    n_base - размер базовой выборки (степень двойки), расчетов всего n_base*(k+2).
+    Возвращает DataFrame: output, param, name, S1, S1_conf, ST, ST_conf.
+    """
+    params = list(params or SCANNABLE_PARAMS)
+    k = len(params)
+    designs = saltelli_sample([SCANNABLE_PARAMS[p]["range"] for p in params], n_base, seed)
+    outputs = evaluate_designs(base_inputs, designs, params)
+
+    frames = []
+    for key in SENSITIVITY_OUTPUTS:
+        indices = sobol_indices(np.asarray(outputs[key], dtype=float), k, n_bootstrap, seed)
+        frames.append(pd.DataFrame({
+            "output": key,
+            "param": params,
+            "name": [SCANNABLE_PARAMS[p]["name"] for p in params],
+            **indices,
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -1,8 +1,9 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Tuple
 from theme_config import *
 
 
@@ -413,14 +414,27 @@ def _apply_theme(fig, title, xlabel, ylabel):
     )
 
 
-def render_drive_plot(df_sim: pd.DataFrame):
+def _as_frame(sim) -> pd.DataFrame:
+    """Колоночный результат симуляции -> DataFrame (только для отрисовки)."""
+    return sim.to_dataframe() if hasattr(sim, "to_dataframe") else sim
+
+
+def render_drive_plot(df_sim):
+    """
+    Скорость и ток батареи. df_sim - результат симуляции целиком либо итератор
+    чанков (physics.simulate_full_system_stream): тогда трассы дорисовываются
+    по мере расчета. Возвращает полную траекторию (DataFrame).
+    """
+    streaming = not (isinstance(df_sim, pd.DataFrame) or hasattr(df_sim, "to_dataframe"))
+    chunks = df_sim if streaming else [df_sim]
+    
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_sim["t"], y=df_sim["v_kmh"], name="Скорость",
+        x=[], y=[], name="Скорость",
         line=dict(color=PRIMARY, width=3), yaxis="y1"
     ))
     fig.add_trace(go.Scatter(
-        x=df_sim["t"], y=df_sim["I_bat"], name="Ток",
+        x=[], y=[], name="Ток",
         line=dict(color=WARNING, width=2, dash="dot"), yaxis="y2"
     ))
     
@@ -433,10 +447,26 @@ def render_drive_plot(df_sim: pd.DataFrame):
         ),
         legend=dict(x=0.02, y=0.98, bgcolor="rgba(255,255,255,0.8)")
     )
-    st.plotly_chart(fig, use_container_width=True)
+    
+    placeholder = st.empty()
+    frames = []
+    for chunk in chunks:
+        if streaming and not frames and getattr(chunk, "max_time", None):
+            # Ось времени фиксирована, чтобы график не "прыгал" при дорисовке
+            fig.update_xaxes(range=[0, chunk.max_time])
+        frames.append(_as_frame(chunk))
+        speed, current = fig.data
+        speed.x = tuple(speed.x) + tuple(frames[-1]["t"])
+        speed.y = tuple(speed.y) + tuple(frames[-1]["v_kmh"])
+        current.x = tuple(current.x) + tuple(frames[-1]["t"])
+        current.y = tuple(current.y) + tuple(frames[-1]["I_bat"])
+        placeholder.plotly_chart(fig, use_container_width=True)
+    
+    return pd.concat(frames, ignore_index=True) if streaming else frames[0]
 
 
-def render_thermal_plot(df_sim: pd.DataFrame):
+def render_thermal_plot(df_sim):
+    df_sim = _as_frame(df_sim)
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=df_sim["t"], y=df_sim["T_drive"], name="Ход", line=dict(color=WARNING, width=3)))
     fig.add_trace(go.Scatter(x=df_sim["t"], y=df_sim["T_weapon"], name="Оружие", line=dict(color=ERROR, width=3)))
@@ -473,6 +503,61 @@ def render_parameter_scan_plots(df_scan: pd.DataFrame, param_name: str, param_un
             st.plotly_chart(f, use_container_width=True)
 
 
+def render_grid_scan_plot(
+    df_grid: pd.DataFrame,
+    x_param: str,
+    y_param: str,
+    metric: str,
+    title: str,
+    labels: Dict[str, str],
+    fixed: Dict = None,
+    contour: bool = False,
+    highlight: str = None
+):
+    """
+    Тепловая карта (или изолинии) метрики по двум осям сеточного скана
+    analysis.run_grid_scan. Остальные оси фиксируются в узлах, ближайших
+    к fixed (по умолчанию - средний узел). labels - {колонка: подпись оси}.
+    highlight - булева колонка (например, pareto): такие узлы отмечаются точками.
+    """
+    axes = df_grid.attrs["axes"]
+    mask = pd.Series(True, index=df_grid.index)
+    for name, axis in axes.items():
+        if name in (x_param, y_param):
+            continue
+        target = (fixed or {}).get(name, axis[len(axis) // 2])
+        mask &= df_grid[name] == axis[abs(axis - target).argmin()]
+    grid = df_grid[mask].pivot(index=y_param, columns=x_param, values=metric)
+    
+    trace = go.Contour if contour else go.Heatmap
+    fig = go.Figure(trace(
+        x=grid.columns, y=grid.index, z=grid.values,
+        colorscale="Viridis", colorbar=dict(title=labels.get(metric, metric))
+    ))
+    if highlight:
+        marked = df_grid[mask & df_grid[highlight].astype(bool)]
+        fig.add_trace(go.Scatter(
+            x=marked[x_param], y=marked[y_param], mode="markers", name=labels.get(highlight, highlight),
+            marker=dict(color=WARNING, size=7, line=dict(color="white", width=1))
+        ))
+    _apply_theme(fig, title, labels.get(x_param, x_param), labels.get(y_param, y_param))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_sensitivity_plot(df_sens: pd.DataFrame, output: str, title: str):
+    """Индексы Соболя одного выхода: S1 и ST по параметрам с 95% интервалами бутстрепа."""
+    df = df_sens[df_sens["output"] == output].sort_values("ST", ascending=True)
+    fig = go.Figure()
+    for key, label, color in [("S1", "Первого порядка (S1)", PRIMARY), ("ST", "Полный (ST)", WARNING)]:
+        fig.add_trace(go.Bar(
+            y=df["name"], x=df[key], name=label, orientation="h",
+            marker_color=color, error_x=dict(type="data", array=df[f"{key}_conf"], visible=True)
+        ))
+    _apply_theme(fig, title, "Доля дисперсии", "")
+    fig.update_layout(barmode="group", legend=dict(orientation="h", y=-0.2))
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def render_comparison_view(config_a: Dict, config_b: Dict, comparison: Dict):
     col_a, col_b = st.columns(2)
     with col_a:
@@ -485,6 +570,30 @@ def render_comparison_view(config_a: Dict, config_b: Dict, comparison: Dict):
         st.metric("Масса", f"{config_b['total_mass']:.1f} кг", f"{comparison['total_mass']['delta']:+.1f}")
 
 
+TOURNAMENT_COLUMNS = {
+    "rank": "Место",
+    "name": "Конфигурация",
+    "wins": "Победы",
+    "losses": "Поражения",
+    "draws": "Ничьи",
+    "win_rate": "Доля побед",
+    "g_margin": "Перевес, G",
+    "g_dealt_avg": "Наносит, G",
+    "g_received_avg": "Получает, G",
+    "recoil_kmh_avg": "Отскок, км/ч",
+    "energy_kj": "Энергия, кДж",
+    "total_mass": "Масса, кг",
+}
+
+
+def render_tournament_table(ranking: pd.DataFrame):
+    """Рейтинг турнира (comparison.tournament_ranking), сортируется кликом по столбцу."""
+    st.dataframe(
+        ranking.rename(columns=TOURNAMENT_COLUMNS).round(2),
+        hide_index=True, use_container_width=True
+    )
+
+
 def render_optimization_progress(history: list):
     if not history: return
     df = pd.DataFrame(history)
@@ -493,19 +602,17 @@ def render_optimization_progress(history: list):
     _apply_theme(fig, "Сходимость", "Итерация", "Целевая функция")
     st.plotly_chart(fig, use_container_width=True)
 
-def render_monte_carlo_plot(df_mc: pd.DataFrame, metric_col: str, title: str, unit: str):
-    """Отрисовка гистограммы распределения (Монте-Карло)."""
-    fig = px.histogram(
-        df_mc, 
-        x=metric_col, 
-        nbins=20,
-        title=title,
-        color_discrete_sequence=[PRIMARY],
+def _monte_carlo_figure(edges, counts, title: str, unit: str, mean_val: float, std_val: float):
+    """Гистограмма исходов (границы и счетчики бинов) с линией среднего и полосой ±2σ."""
+    edges = np.asarray(edges, dtype=float)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        marker_color=PRIMARY,
         opacity=0.8
-    )
-    
-    mean_val = df_mc[metric_col].mean()
-    std_val = df_mc[metric_col].std()
+    ))
+    fig.update_layout(bargap=0)
     
     # Линия среднего
     fig.add_vline(x=mean_val, line_dash="dash", line_color=WARNING, annotation_text="Среднее")
@@ -523,6 +630,67 @@ def render_monte_carlo_plot(df_mc: pd.DataFrame, metric_col: str, title: str, un
     )
     
     _apply_theme(fig, title, f"{title} ({unit})", "Количество исходов")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+
+def render_monte_carlo_stream(stream, metrics: List[Tuple[str, str, str]]):
+    """
+    Прогрессивная отрисовка Монте-Карло: stream - physics.run_monte_carlo_stream,
+    metrics - [(колонка, заголовок, единица)]. Гистограммы и текст с ДИ
+    обновляются после каждого чанка; прерывание скрипта (Stop, смена настроек)
+    закрывает генератор и останавливает расчет. Строки не накапливаются:
+    счетчики бинов гистограмм и статистики приходят из потока.
+    Возвращает последнее обновление потока (None, если поток пуст).
+    """
+    progress = st.progress(0.0, text="Запуск...")
+    slots = [(st.empty(), st.empty()) for _ in metrics]
     
-    return mean_val, std_val
+    update = None
+    for update in stream:
+        progress.progress(
+            min(update["done"] / max(update["total"], 1), 1.0),
+            text=f"Выполнено {update['done']} из {update['total']} симуляций"
+        )
+        for (col, title, unit), (chart_slot, text_slot) in zip(metrics, slots):
+            stats, histogram = update["stats"][col], update["histograms"][col]
+            chart_slot.plotly_chart(
+                _monte_carlo_figure(histogram["edges"], histogram["counts"], title, unit, stats["mean"], stats["std"]),
+                use_container_width=True
+            )
+            
+            ci = update["ci_width"].get(col, float("inf"))
+            ci_text = f" ± {ci * abs(stats['mean']) / 2:.2f}" if ci < float("inf") else ""
+            low, high = stats["quantiles"].get(0.025), stats["quantiles"].get(0.975)
+            range_text = f" С вероятностью 95% значение в диапазоне **{low:.1f} ... {high:.1f} {unit}**." if low is not None else ""
+            text_slot.info(f"Среднее: **{stats['mean']:.1f}{ci_text} {unit}** (95% ДИ среднего).{range_text}")
+    
+    progress.empty()
+    return update
+
+
+def render_paired_monte_carlo(df_pair: pd.DataFrame, metrics: List[Tuple[str, str, str]], name_a: str, name_b: str):
+    """
+    Парный Монте-Карло (physics.run_paired_monte_carlo): гистограмма разностей B - A
+    по каждой метрике [(колонка, заголовок, единица)] и вероятность, что B лучше.
+    """
+    summary = df_pair.attrs.get("summary", {})
+    cols = st.columns(len(metrics))
+    for (key, title, unit), col in zip(metrics, cols):
+        stats = summary[key]
+        fig = px.histogram(
+            x=df_pair[f"delta_{key}"],
+            nbins=20,
+            title=title,
+            color_discrete_sequence=[PRIMARY],
+            opacity=0.8
+        )
+        fig.add_vline(x=0.0, line_color=TEXT_SECONDARY)
+        fig.add_vline(x=stats["mean_delta"], line_dash="dash", line_color=WARNING, annotation_text="Среднее")
+        _apply_theme(fig, title, f"{name_b} − {name_a} ({unit})", "Количество исходов")
+        with col:
+            st.plotly_chart(fig, use_container_width=True)
+            st.metric(
+                f"P({name_b} лучше)", f"{stats['p_b_better'] * 100:.1f}%",
+                f"{stats['mean_delta']:+.2f} ± {stats['ci_half']:.2f} {unit}", delta_color="off"
+            )
+            st.caption(f"ДИ без общих случайных чисел: ± {stats['ci_half_unpaired']:.2f} {unit}")
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Хранилище результатов тестов - во временном каталоге, не в .cache проекта
+os.environ.setdefault("ROBOT_RESULT_STORE", os.path.join(tempfile.mkdtemp(), "results.sqlite"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
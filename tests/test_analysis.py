@@ -0,0 +1,13 @@
+import pytest
+
+from analysis import SCANNABLE_PARAMS, run_adaptive_scan
+from benchmarks import DEFAULT_INPUTS
+
+
+@pytest.mark.parametrize("param_name", list(SCANNABLE_PARAMS))
+@pytest.mark.parametrize("max_points", [8, 10, 15, 30])
+def test_adaptive_scan_respects_budget(param_name, max_points):
+    result = run_adaptive_scan.__wrapped__(
+        DEFAULT_INPUTS, param_name, SCANNABLE_PARAMS[param_name]["range"], max_points=max_points
+    )
+    assert len(result) <= max_points
@@ -0,0 +1,31 @@
+from result_store import ResultStore
+
+
+def test_unhashable_inputs_degrade_to_compute(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    calls = []
+
+    @store.persistent("demo")
+    def compute(value, options):
+        calls.append(value)
+        return value * 2
+
+    # set не сериализуется в JSON: хранилище - промах, расчет идет без него
+    assert compute(3, {1, 2}) == 6
+    assert compute(3, {1, 2}) == 6
+    assert calls == [3, 3]
+    assert store.stats()["entries"] == 0
+
+
+def test_unpicklable_result_is_not_stored(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    value = store.get_or_compute("demo", {"x": 1}, lambda: (lambda: None))
+    assert callable(value)
+    assert store.get("demo", {"x": 1}) is None
+
+
+def test_configuration_name_is_not_part_of_the_key(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.put("demo", {"base_inputs": {"name": "A", "motor_kv": 190}}, 42)
+    assert store.get("demo", {"base_inputs": {"name": "B", "motor_kv": 190}}) == 42
+    assert store.get("demo", {"base_inputs": {"name": "A", "motor_kv": 200}}) is None